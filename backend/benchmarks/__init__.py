@@ -0,0 +1,7 @@
+"""
+Benchmarks - Headless performance measurements for the chain generation engine
+
+Run from the backend folder, e.g.:
+
+    python -m benchmarks.engine --nodes 10 200 2000 --rows 100 10000 100000
+"""
@@ -0,0 +1,218 @@
+"""
+Engine benchmark - times each stage of chain generation on synthetic workloads
+
+Stages: model list parse, plan compile, variable resolution, XML generation,
+file write and ZIP. Every graph size is combined with every model list size.
+Parsing always reads the full model list; the generation stages run on the
+first --generate-models models and report per-model throughput, since their
+cost per model does not depend on the list length.
+
+Usage (from the backend folder):
+
+    python -m benchmarks.engine --nodes 10 200 2000 --rows 100 10000 100000 \\
+        --output results.json --compare baseline.json
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.report import compare_metrics, environment_info, load_results, print_comparison, write_results
+from benchmarks.workloads import make_graph, make_variables, usable_node_types, write_model_list
+from services.result_archive import ResultArchiveWriter
+from services.workflow_runner import build_command_chain, compile_workflow, resolve_variable
+from utils.data_loader import read_model_names
+
+# A stage returns (units processed, bytes produced)
+Stage = Callable[[], Tuple[int, int]]
+
+
+def measure(stage: Stage, track_memory: bool) -> Dict[str, Any]:
+    """
+    Time a stage, then run it again under tracemalloc for its peak memory
+
+    The memory pass is separate so tracing overhead does not skew the timing.
+    """
+    start = time.perf_counter()
+    units, size = stage()
+    seconds = time.perf_counter() - start
+
+    result = {
+        'seconds': round(seconds, 6),
+        'units': units,
+        'units_per_second': round(units / seconds, 2) if seconds > 0 else None,
+        'bytes': size,
+        'bytes_per_second': round(size / seconds, 2) if seconds > 0 and size else None,
+        'peak_memory_bytes': None,
+    }
+    if track_memory:
+        tracemalloc.start()
+        try:
+            stage()
+            result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_case(
+    node_count: int,
+    rows: int,
+    model_list_path: Path,
+    node_types: List[str],
+    generate_models: int,
+    work_dir: Path,
+    track_memory: bool,
+) -> Dict[str, Any]:
+    """Benchmark every stage for one graph size and one model list"""
+    graph = make_graph(node_count, node_types)
+    nodes, edges = graph['nodes'], graph['edges']
+    variables = make_variables()
+    per_run_vars = {v['name']: v['value'] for v in variables if v.get('scope') == 'per-run'}
+
+    state: Dict[str, Any] = {}
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    def parse() -> Tuple[int, int]:
+        state['models'] = read_model_names(str(model_list_path), 0)
+        return len(state['models']), model_list_path.stat().st_size
+
+    stages['parse'] = measure(parse, track_memory)
+    sample = state['models'][:generate_models]
+
+    def plan() -> Tuple[int, int]:
+        state['plan'] = compile_workflow(nodes, edges)
+        return len(state['plan']), 0
+
+    stages['plan'] = measure(plan, track_memory)
+
+    def resolve() -> Tuple[int, int]:
+        count = 0
+        for model_name in sample:
+            for node in state['plan']:
+                for value in node.get('data', {}).values():
+                    if isinstance(value, str):
+                        resolve_variable(value, model_name, variables, per_run_vars)
+                        count += 1
+        return count, 0
+
+    stages['resolve'] = measure(resolve, track_memory)
+
+    node_output = work_dir / 'node_output'
+    node_output.mkdir(exist_ok=True)
+
+    def generate() -> Tuple[int, int]:
+        state['chains'] = [
+            '\n'.join(build_command_chain(nodes, edges, name, variables, per_run_vars, 'Model', str(node_output), state['plan']))
+            for name in sample
+        ]
+        return len(sample), sum(len(chain.encode('utf-8')) for chain in state['chains'])
+
+    stages['generate'] = measure(generate, track_memory)
+
+    chain_dir = work_dir / 'chains'
+    chain_dir.mkdir(exist_ok=True)
+
+    def write() -> Tuple[int, int]:
+        paths, size = [], 0
+        for name, chain in zip(sample, state['chains']):
+            path = chain_dir / f"{name}.chain"
+            with open(path, 'w', encoding='utf-8') as f:
+                size += f.write(chain)
+            paths.append(path)
+        state['paths'] = paths
+        return len(paths), size
+
+    stages['write'] = measure(write, track_memory)
+
+    def package() -> Tuple[int, int]:
+        zip_path = work_dir / 'chains.zip'
+        archive = ResultArchiveWriter(zip_path)
+        for path in state['paths']:
+            archive.add(path, path.name)
+        parts = archive.close()
+        return len(state['paths']), parts[0]['size'] if parts else 0
+
+    stages['zip'] = measure(package, track_memory)
+
+    per_model = sum(stages[s]['seconds'] for s in ('generate', 'write', 'zip')) / max(len(sample), 1)
+    return {
+        'nodes': node_count,
+        'rows': rows,
+        'models_generated': len(sample),
+        'stages': stages,
+        'estimated_full_run_seconds': round(stages['parse']['seconds'] + stages['plan']['seconds'] + per_model * rows, 3),
+    }
+
+
+def case_metrics(results: Dict[str, Any]) -> Dict[str, float]:
+    """Flatten results to {case/stage: seconds} for comparison"""
+    return {
+        f"nodes={case['nodes']} rows={case['rows']} {stage}": data['seconds']
+        for case in results.get('cases', [])
+        for stage, data in case['stages'].items()
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the chain generation engine")
+    parser.add_argument('--nodes', type=int, nargs='+', default=[10, 200, 2000], help="Graph sizes (command nodes)")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 10000, 100000], help="Model list sizes")
+    parser.add_argument('--format', choices=['xlsx', 'csv'], default='xlsx', help="Model list file format")
+    parser.add_argument('--generate-models', type=int, default=200, help="Models generated per case")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak memory pass")
+    parser.add_argument('--output', help="Write JSON results to this file (default: stdout)")
+    parser.add_argument('--compare', help="Baseline results JSON to compare stage timings against")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Slowdown ratio flagged as a regression")
+    args = parser.parse_args(argv)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='pychain-bench-') as tmp:
+        work_dir = Path(tmp)
+        # createMtfFile writes its .mtf into the working directory
+        os.chdir(work_dir)
+        try:
+            node_types, failing = usable_node_types(str(work_dir))
+
+            cases = []
+            for rows in args.rows:
+                model_list_path = write_model_list(work_dir / f"models_{rows}.{args.format}", rows)
+                for node_count in args.nodes:
+                    case_dir = work_dir / f"case_{node_count}_{rows}"
+                    case_dir.mkdir()
+                    cases.append(run_case(
+                        node_count, rows, model_list_path, node_types,
+                        args.generate_models, case_dir, not args.no_memory,
+                    ))
+                    sys.stderr.write(f"nodes={node_count} rows={rows} done\n")
+        finally:
+            os.chdir(cwd)
+
+    results = {
+        'benchmark': 'engine',
+        'environment': environment_info(),
+        'settings': {
+            'format': args.format,
+            'generate_models': args.generate_models,
+            'node_types': node_types,
+            'skipped_node_types': failing,
+        },
+        'cases': cases,
+    }
+    write_results(results, args.output)
+
+    if args.compare:
+        rows = compare_metrics(case_metrics(results).items(), case_metrics(load_results(args.compare)), args.threshold)
+        print_comparison(rows, 's')
+        if any(row['regression'] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Generator micro-benchmarks - calls every command generator in commands/*/
+with representative arguments
+
+Reports calls per second, bytes produced per call and, unless --no-memory
+is given, the peak memory and the number of memory blocks each call leaves
+allocated (its output). Generators that write files instead of returning
+XML lines (createMtfFile, createTemplateFile) are measured by the files
+they write.
+
+Usage (from the backend folder):
+
+    python -m benchmarks.generators --output generators.json --compare baseline.json
+"""
+
+import argparse
+import importlib
+import inspect
+import os
+import pkgutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import commands
+from benchmarks.report import compare_metrics, environment_info, load_results, print_comparison, write_results
+from benchmarks.workloads import model_names
+
+_MODEL = model_names(1)[0]
+
+# Representative values for generator parameters, by parameter name
+ARGUMENTS: Dict[str, Any] = {
+    'model_name': _MODEL,
+    'cell_value': _MODEL,
+    'variable': _MODEL,
+    'modified_variable': _MODEL.replace('-', ' '),
+    'name': f"LABEL_{_MODEL}",
+    'label_name': f"LABEL_{_MODEL}",
+    'comment_name': _MODEL,
+    'comments': f"{_MODEL} CIV",
+    'command_name': 'Benchmark Command',
+    'function_name': f"FN_{_MODEL}",
+    'view_name': 'PLAN VIEW',
+    'pattern': f"{_MODEL}*",
+    'pattern_search': _MODEL,
+    'pattern_replace': f"{_MODEL}_RENAMED",
+    'prefix': 'BM_',
+    'discipline': 'CIV',
+    'project_folder': 'C:/Projects/Benchmark',
+    'file_path': f"C:/Projects/Benchmark/Models/{_MODEL}.ifc",
+    'PrePostfixForModels': 'BM_',
+    'tin_name': f"TIN_{_MODEL}",
+    'trimesh_name': f"TRIMESH_{_MODEL}",
+    'export_location': 'C:/Projects/Benchmark/Reports',
+    'output_location': 'C:/Projects/Benchmark/Reports',
+    'filename': f"{_MODEL}.rpt",
+    'z_offset': '0.0',
+    'depth': '1.0',
+    'colour': 'red',
+    'file_ext': '.ifc',
+    'options_ext': '.tin',
+    'surface_value': 'Surface',
+    'object_dimension': '3d',
+    'description': 'Benchmark model',
+    'mtf_name': 'mtf_name',
+    'template_name': 'template_name',
+}
+
+# Modules under commands/ that hold helpers rather than generators
+_HELPER_MODULES = {'commands.importers.utils'}
+
+Generator = Callable[..., Any]
+
+
+def discover_generators() -> Tuple[Dict[str, Generator], Dict[str, str]]:
+    """
+    Import every module under commands/ and collect its public functions
+
+    Returns:
+        Tuple of ({module.function: function}, {module: import error} for modules that fail to import)
+    """
+    generators: Dict[str, Generator] = {}
+    failing: Dict[str, str] = {}
+    for info in pkgutil.walk_packages(commands.__path__, 'commands.'):
+        if info.ispkg or info.name in _HELPER_MODULES:
+            continue
+        try:
+            module = importlib.import_module(info.name)
+        except Exception as e:
+            failing[info.name] = f"{type(e).__name__}: {e}"
+            continue
+        for name, func in inspect.getmembers(module, inspect.isfunction):
+            if func.__module__ == info.name and not name.startswith('_'):
+                generators[f"{info.name}.{name}"] = func
+    return dict(sorted(generators.items())), failing
+
+
+def representative_arguments(func: Generator) -> Dict[str, Any]:
+    """Build keyword arguments for a generator from its signature"""
+    kwargs = {}
+    for param in inspect.signature(func).parameters.values():
+        if param.name in ARGUMENTS:
+            kwargs[param.name] = ARGUMENTS[param.name]
+        elif param.default is not inspect.Parameter.empty:
+            continue
+        elif param.annotation is bool:
+            kwargs[param.name] = True
+        else:
+            kwargs[param.name] = f"{param.name}_value"
+    return kwargs
+
+
+def output_bytes(result: Any, work_dir: Path) -> int:
+    """Bytes produced by one call: the XML lines returned, or the files written"""
+    if isinstance(result, list):
+        return sum(len(line.encode('utf-8')) for line in result) + len(result)
+    return sum(path.stat().st_size for path in work_dir.rglob('*') if path.is_file())
+
+
+def bench_generator(func: Generator, repeat: int, track_memory: bool, work_dir: Path) -> Dict[str, Any]:
+    """
+    Benchmark one generator
+
+    Calls are timed in loops long enough to be measurable (timeit autorange)
+    and the best of repeat loops is kept.
+    """
+    kwargs = representative_arguments(func)
+    call = lambda: func(**kwargs)
+    bytes_per_call = output_bytes(call(), work_dir)
+
+    timer = timeit.Timer(call)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat, number)) / number
+
+    result = {
+        'calls_per_second': round(1 / best, 2) if best > 0 else None,
+        'seconds_per_call': best,
+        'bytes_per_call': bytes_per_call,
+        'peak_bytes_per_call': None,
+        'blocks_per_call': None,
+    }
+    if track_memory:
+        calls = 100
+        tracemalloc.start()
+        try:
+            call()
+            tracemalloc.reset_peak()
+            call()
+            result['peak_bytes_per_call'] = tracemalloc.get_traced_memory()[1]
+
+            # Keep every result alive so the blocks they hold show up in the diff
+            kept: List[Any] = [None] * calls
+            before = tracemalloc.take_snapshot()
+            for i in range(calls):
+                kept[i] = call()
+            after = tracemalloc.take_snapshot()
+            blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+            result['blocks_per_call'] = round(max(blocks, 0) / calls, 2)
+            del kept
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every command generator")
+    parser.add_argument('--filter', help="Only benchmark generators whose name contains this text")
+    parser.add_argument('--repeat', type=int, default=5, help="Timing loops per generator (best is kept)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc allocation pass")
+    parser.add_argument('--output', help="Write JSON results to this file (default: stdout)")
+    parser.add_argument('--compare', help="Baseline results JSON to compare calls per second against")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Slowdown ratio flagged as a regression")
+    args = parser.parse_args(argv)
+
+    generators, failing = discover_generators()
+    results_by_name: Dict[str, Dict[str, Any]] = {}
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='pychain-bench-') as tmp:
+        for name, func in generators.items():
+            if args.filter and args.filter not in name:
+                continue
+            # File generators write relative to the working directory
+            work_dir = Path(tmp) / name
+            work_dir.mkdir()
+            os.chdir(work_dir)
+            try:
+                results_by_name[name] = bench_generator(func, args.repeat, not args.no_memory, work_dir)
+            except Exception as e:
+                failing[name] = f"{type(e).__name__}: {e}"
+            finally:
+                os.chdir(cwd)
+            sys.stderr.write(f"{name} done\n")
+
+    results = {
+        'benchmark': 'generators',
+        'environment': environment_info(),
+        'generators': results_by_name,
+        'failing': failing,
+    }
+    write_results(results, args.output)
+
+    if args.compare:
+        baseline = load_results(args.compare).get('generators', {})
+        rows = compare_metrics(
+            ((name, data['calls_per_second']) for name, data in results_by_name.items()),
+            {name: data['calls_per_second'] for name, data in baseline.items()},
+            args.threshold,
+            higher_is_better=True,
+        )
+        print_comparison(rows, ' calls/s')
+        if any(row['regression'] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
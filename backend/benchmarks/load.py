@@ -0,0 +1,506 @@
+"""
+Load test - replays a mix of workflow uploads, runs, status polls and downloads
+against the HTTP API at increasing concurrency
+
+A scenario is a JSON file under benchmarks/scenarios/ (or any path):
+
+    {
+        "description": "...",
+        "model_list": {"rows": 500, "format": "csv"},   # synthetic, or {"file": "models.csv"}
+        "graph": {"nodes": 20},                         # synthetic, or {"file": "graph.json"}
+        "variables": [...],                             # optional, synthetic defaults otherwise
+        "concurrency": [1, 4, 16],                      # client threads, one level after another
+        "duration_seconds": 20,                         # per concurrency level
+        "mix": {"run_upload": 1, "run_hash": 2, "status": 10, "results": 1, "download": 1}
+    }
+
+Files are relative to the scenario. Operations, picked at random by weight:
+
+    run_upload  POST /api/workflow/run uploading the model list (force=true)
+    run_hash    POST /api/workflow/run referencing the stored model list by hash (force=true)
+    status      GET the status of a random session still running (or any when none are)
+    results     GET the first page of results of a completed session
+    download    GET the ZIP of a completed session
+
+status, results and download fall back to run_hash until a session exists.
+Unless --url is given, the app is started with uvicorn on a free local port in
+a scratch folder, so its uploads/ and output/ are thrown away afterwards.
+
+Usage (from the backend folder):
+
+    python -m benchmarks.load --scenario mixed [--concurrency 1 8 32] [--duration 30] \\
+        [--url http://127.0.0.1:8001] --output load.json --compare baseline.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.report import compare_metrics, environment_info, load_results, print_comparison, write_results
+from benchmarks.workloads import make_graph, make_variables, usable_node_types, write_model_list
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCENARIOS_DIR = Path(__file__).resolve().parent / 'scenarios'
+OPERATIONS = ('run_upload', 'run_hash', 'status', 'results', 'download')
+PERCENTILES = (50, 90, 95, 99)
+
+# (body, content type) of an encoded request
+Body = Tuple[bytes, str]
+
+
+def resolve_scenario(name: str) -> Path:
+    """A scenario path, or the name of a file in benchmarks/scenarios/"""
+    path = Path(name)
+    if path.exists():
+        return path
+    path = SCENARIOS_DIR / f"{name}.json"
+    if not path.exists():
+        available = ', '.join(sorted(p.stem for p in SCENARIOS_DIR.glob('*.json')))
+        raise SystemExit(f"Unknown scenario {name!r} (available: {available})")
+    return path
+
+
+def load_scenario(path: Path, work_dir: Path) -> Dict[str, Any]:
+    """
+    Read a scenario and materialise its model list and graph
+
+    Returns:
+        The scenario with 'model_list_path', 'graph' and 'variables' resolved
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        scenario = json.load(f)
+    scenario['name'] = path.stem
+
+    model_list = scenario.get('model_list') or {'rows': 100}
+    if 'file' in model_list:
+        scenario['model_list_path'] = (path.parent / model_list['file']).resolve()
+    else:
+        file_format = model_list.get('format', 'csv')
+        scenario['model_list_path'] = write_model_list(
+            work_dir / f"models.{file_format}", int(model_list['rows']), file_format,
+        )
+
+    graph = scenario.get('graph') or {'nodes': 10}
+    if 'file' in graph:
+        with open(path.parent / graph['file'], 'r', encoding='utf-8') as f:
+            scenario['graph'] = json.load(f)
+    else:
+        # Probing node types runs createMtfFile, which writes into the working directory
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            node_types, _ = usable_node_types(str(work_dir))
+        finally:
+            os.chdir(cwd)
+        scenario['graph'] = make_graph(int(graph['nodes']), node_types)
+    scenario.setdefault('variables', make_variables())
+    scenario.setdefault('concurrency', [1, 4, 16])
+    scenario.setdefault('duration_seconds', 20)
+    scenario.setdefault('mix', {'run_upload': 1, 'run_hash': 2, 'status': 10, 'results': 1, 'download': 1})
+    unknown = set(scenario['mix']) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    return scenario
+
+
+def encode_multipart(fields: Dict[str, str], files: Dict[str, Tuple[str, bytes]]) -> Body:
+    """Encode form fields and (filename, bytes) files as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+        )
+    for name, (filename, data) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + data + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def run_bodies(scenario: Dict[str, Any], excel_hash: Optional[str] = None) -> Body:
+    """The /api/workflow/run request of a scenario, uploading the model list or referencing it by hash"""
+    model_list_path = Path(scenario['model_list_path'])
+    files = {
+        'workflow_graph': ('graph.json', json.dumps(scenario['graph']).encode('utf-8')),
+        'variables': ('variables.json', json.dumps(scenario['variables']).encode('utf-8')),
+    }
+    fields = {'force': 'true'}
+    if excel_hash:
+        fields.update(excel_file_hash=excel_hash, excel_file_name=model_list_path.name)
+    else:
+        files['excel_file'] = (model_list_path.name, model_list_path.read_bytes())
+    return encode_multipart(fields, files)
+
+
+class Client:
+    """One keep-alive HTTP connection, reconnecting after errors"""
+
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, body: Optional[Body] = None) -> Tuple[int, bytes]:
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {'Content-Type': body[1]} if body else {}
+        try:
+            self._connection.request(method, path, body[0] if body else None, headers)
+            response = self._connection.getresponse()
+            return response.status, response.read()
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class SessionPool:
+    """Sessions submitted during the test, split into running and completed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running: List[str] = []
+        self.completed: List[str] = []
+        self.submitted = 0
+
+    def add(self, session_id: str) -> None:
+        with self._lock:
+            self.running.append(session_id)
+            self.submitted += 1
+
+    def mark(self, session_id: str, status: str) -> None:
+        if status == 'processing':
+            return
+        with self._lock:
+            if session_id in self.running:
+                self.running.remove(session_id)
+                if status == 'completed':
+                    self.completed.append(session_id)
+
+    def pick_running(self, rng: random.Random) -> Optional[str]:
+        with self._lock:
+            pool = self.running or self.completed
+            return rng.choice(pool) if pool else None
+
+    def pick_completed(self, rng: random.Random) -> Optional[str]:
+        with self._lock:
+            return rng.choice(self.completed) if self.completed else None
+
+
+class Recorder:
+    """Latencies, status codes and errors per operation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {op: [] for op in OPERATIONS}
+        self.statuses: Dict[str, Dict[str, int]] = {op: {} for op in OPERATIONS}
+        self.errors: Dict[str, int] = {op: 0 for op in OPERATIONS}
+
+    def add(self, op: str, seconds: float, status: str, error: bool) -> None:
+        with self._lock:
+            self.latencies[op].append(seconds)
+            self.statuses[op][status] = self.statuses[op].get(status, 0) + 1
+            self.errors[op] += error
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def next_request(
+    op: str,
+    bodies: Dict[str, Body],
+    sessions: SessionPool,
+    rng: random.Random,
+) -> Tuple[str, Optional[str], Tuple[str, str, Optional[Body]]]:
+    """
+    Build the request of an operation
+
+    Returns:
+        Tuple of (operation actually performed, session id it targets,
+        (method, path, body))
+    """
+    if op == 'status':
+        session_id = sessions.pick_running(rng)
+        if session_id:
+            return op, session_id, ('GET', f"/api/workflow/status/{session_id}", None)
+    elif op in ('results', 'download'):
+        session_id = sessions.pick_completed(rng)
+        if session_id:
+            path = (
+                f"/api/workflow/results/{session_id}?limit=100" if op == 'results'
+                else f"/api/workflow/download/{session_id}"
+            )
+            return op, session_id, ('GET', path, None)
+    elif op == 'run_upload':
+        return op, None, ('POST', '/api/workflow/run', bodies['run_upload'])
+    # Nothing to poll or download yet: submit a run instead
+    return 'run_hash', None, ('POST', '/api/workflow/run', bodies['run_hash'])
+
+
+def worker(
+    base_url: str,
+    deadline: float,
+    mix: Dict[str, float],
+    bodies: Dict[str, Body],
+    sessions: SessionPool,
+    recorder: Recorder,
+    seed: int,
+) -> None:
+    """Send requests back to back until the deadline"""
+    rng = random.Random(seed)
+    client = Client(base_url)
+    ops, weights = list(mix), list(mix.values())
+    try:
+        while time.perf_counter() < deadline:
+            op, session_id, (method, path, body) = next_request(rng.choices(ops, weights)[0], bodies, sessions, rng)
+            start = time.perf_counter()
+            try:
+                status, data = client.request(method, path, body)
+            except Exception as e:
+                recorder.add(op, time.perf_counter() - start, type(e).__name__, True)
+                continue
+            recorder.add(op, time.perf_counter() - start, str(status), status >= 400)
+            if status >= 400:
+                continue
+            if op.startswith('run_'):
+                sessions.add(json.loads(data)['session_id'])
+            elif op == 'status':
+                sessions.mark(session_id, json.loads(data).get('status', ''))
+    finally:
+        client.close()
+
+
+def run_level(
+    base_url: str,
+    scenario: Dict[str, Any],
+    concurrency: int,
+    duration: float,
+    bodies: Dict[str, Body],
+    seed: int,
+) -> Dict[str, Any]:
+    """Run the scenario's mix with concurrency client threads for duration seconds"""
+    sessions = SessionPool()
+    recorder = Recorder()
+    mix = {op: weight for op, weight in scenario['mix'].items() if weight > 0}
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(base_url, start + duration, mix, bodies, sessions, recorder, seed + i),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    operations = {}
+    for op in OPERATIONS:
+        latencies = sorted(recorder.latencies[op])
+        if not latencies:
+            continue
+        operations[op] = {
+            'count': len(latencies),
+            'errors': recorder.errors[op],
+            'error_rate': round(recorder.errors[op] / len(latencies), 4),
+            'statuses': recorder.statuses[op],
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'latency_seconds': {
+                'mean': round(sum(latencies) / len(latencies), 6),
+                **{f"p{pct}": round(percentile(latencies, pct), 6) for pct in PERCENTILES},
+                'max': round(latencies[-1], 6),
+            },
+        }
+    requests = sum(op['count'] for op in operations.values())
+    errors = sum(op['errors'] for op in operations.values())
+    return {
+        'concurrency': concurrency,
+        'duration_seconds': round(elapsed, 3),
+        'requests': requests,
+        'throughput_rps': round(requests / elapsed, 2),
+        'error_rate': round(errors / requests, 4) if requests else 0.0,
+        'sessions_submitted': sessions.submitted,
+        'sessions_seen_completed': len(sessions.completed),
+        'operations': operations,
+    }
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server_dir: Path, timeout: float = 60.0) -> Tuple[subprocess.Popen, str]:
+    """
+    Start the app with uvicorn in server_dir and wait until it answers
+
+    Returns:
+        Tuple of (server process, base URL)
+    """
+    port = free_port()
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [str(BACKEND_DIR), os.getenv('PYTHONPATH')]))}
+    log = open(server_dir / 'server.log', 'wb')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        cwd=server_dir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    log.close()
+    base_url = f"http://127.0.0.1:{port}"
+    client = Client(base_url, timeout=5)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            if client.request('GET', '/')[0] == 200:
+                client.close()
+                return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    output = (server_dir / 'server.log').read_text(encoding='utf-8', errors='replace')
+    raise SystemExit(f"Server did not start:\n{output[-2000:]}")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def prepare(base_url: str, scenario: Dict[str, Any]) -> Dict[str, Body]:
+    """Upload the model list once (for its hash) and encode the run requests"""
+    client = Client(base_url)
+    try:
+        status, data = client.request('POST', '/api/workflow/run', run_bodies(scenario))
+        if status >= 400:
+            raise SystemExit(f"Warm-up run failed with HTTP {status}: {data[:500]!r}")
+    finally:
+        client.close()
+    return {
+        'run_upload': run_bodies(scenario),
+        'run_hash': run_bodies(scenario, json.loads(data)['excel_hash']),
+    }
+
+
+def level_metrics(results: Dict[str, Any]) -> Dict[str, float]:
+    """p95 latency of every operation at every concurrency level, for comparison"""
+    return {
+        f"c{level['concurrency']}/{op}/p95": stats['latency_seconds']['p95']
+        for level in results['levels']
+        for op, stats in level['operations'].items()
+    }
+
+
+def print_levels(levels: List[Dict[str, Any]]) -> None:
+    """Print a per-level, per-operation table to stderr (stdout may carry the JSON results)"""
+    sys.stderr.write(f"{'conc':>5} {'operation':<11} {'count':>7} {'rps':>8} {'err%':>6} "
+                     f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}\n")
+    for level in levels:
+        for op, stats in level['operations'].items():
+            latency = stats['latency_seconds']
+            sys.stderr.write(
+                f"{level['concurrency']:>5} {op:<11} {stats['count']:>7} {stats['throughput_rps']:>8.1f} "
+                f"{stats['error_rate'] * 100:>6.2f} {latency['p50'] * 1000:>9.1f} "
+                f"{latency['p95'] * 1000:>9.1f} {latency['p99'] * 1000:>9.1f}\n"
+            )
+        sys.stderr.write(
+            f"{level['concurrency']:>5} {'all':<11} {level['requests']:>7} {level['throughput_rps']:>8.1f} "
+            f"{level['error_rate'] * 100:>6.2f}   ({level['sessions_submitted']} runs submitted)\n"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the workflow API")
+    parser.add_argument('--scenario', default='mixed', help="Scenario name in benchmarks/scenarios/ or a path")
+    parser.add_argument('--concurrency', type=int, nargs='+', help="Client threads per level (overrides the scenario)")
+    parser.add_argument('--duration', type=float, help="Seconds per level (overrides the scenario)")
+    parser.add_argument('--url', help="Test an already running server instead of starting one")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the operation mix")
+    parser.add_argument('--output', help="Write JSON results to this file (default: stdout)")
+    parser.add_argument('--compare', help="Baseline results JSON to compare p95 latencies against")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Slowdown ratio flagged as a regression")
+    args = parser.parse_args(argv)
+
+    scenario_path = resolve_scenario(args.scenario)
+    with tempfile.TemporaryDirectory(prefix='pychain-load-') as tmp:
+        work_dir = Path(tmp)
+        scenario = load_scenario(scenario_path, work_dir)
+        concurrency_levels = args.concurrency or scenario['concurrency']
+        duration = args.duration or scenario['duration_seconds']
+
+        process = None
+        base_url = args.url
+        if base_url is None:
+            server_dir = work_dir / 'server'
+            server_dir.mkdir()
+            process, base_url = start_server(server_dir)
+        try:
+            bodies = prepare(base_url, scenario)
+            levels = []
+            for concurrency in concurrency_levels:
+                levels.append(run_level(base_url, scenario, concurrency, duration, bodies, args.seed))
+                sys.stderr.write(f"concurrency={concurrency} done\n")
+        finally:
+            if process is not None:
+                stop_server(process)
+
+    results = {
+        'benchmark': 'load',
+        'environment': environment_info(),
+        'settings': {
+            'scenario': scenario['name'],
+            'description': scenario.get('description', ''),
+            'model_rows': scenario.get('model_list', {}).get('rows'),
+            'graph_nodes': len(scenario['graph'].get('nodes', [])),
+            'mix': scenario['mix'],
+            'duration_seconds': duration,
+            'server': 'external' if args.url else 'local uvicorn',
+        },
+        'levels': levels,
+    }
+    print_levels(levels)
+    write_results(results, args.output)
+
+    if args.compare:
+        rows = compare_metrics(level_metrics(results).items(), level_metrics(load_results(args.compare)), args.threshold)
+        print_comparison(rows, 's')
+        if any(row['regression'] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
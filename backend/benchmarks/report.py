@@ -0,0 +1,91 @@
+"""
+Benchmark reports - JSON results with environment info, and baseline comparison
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+
+def environment_info() -> Dict[str, Any]:
+    """Describe where the benchmark ran, so results from different commits can be compared"""
+    info = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': None,
+    }
+    try:
+        info['git_commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return info
+
+
+def write_results(results: Dict[str, Any], output: Optional[Union[str, Path]] = None) -> None:
+    """Write results as JSON to a file, or to stdout when output is None"""
+    text = json.dumps(results, indent=2)
+    if output is None:
+        sys.stdout.write(text + '\n')
+    else:
+        Path(output).write_text(text + '\n', encoding='utf-8')
+
+
+def load_results(path: Union[str, Path]) -> Dict[str, Any]:
+    """Read results previously written by write_results"""
+    return json.loads(Path(path).read_text(encoding='utf-8'))
+
+
+def compare_metrics(
+    current: Iterable[Tuple[str, float]],
+    baseline: Dict[str, float],
+    threshold: float,
+    higher_is_better: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Compare named metrics against a baseline
+
+    Args:
+        current: (name, value) pairs from this run
+        baseline: {name: value} from the baseline run
+        threshold: Ratio beyond which a metric is flagged, e.g. 1.2 for 20% worse
+        higher_is_better: True for throughput-style metrics, False for timings
+
+    Returns:
+        One row per metric present in both runs: {name, baseline, current, ratio, regression}
+    """
+    rows = []
+    for name, value in current:
+        base = baseline.get(name)
+        if not base or value is None:
+            continue
+        ratio = value / base
+        worse = (1 / ratio if ratio else float('inf')) if higher_is_better else ratio
+        rows.append({
+            'name': name,
+            'baseline': base,
+            'current': value,
+            'ratio': round(ratio, 3),
+            'regression': worse > threshold,
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], unit: str = '') -> None:
+    """Print a comparison table to stderr (stdout may carry the JSON results)"""
+    for row in rows:
+        flag = '  REGRESSION' if row['regression'] else ''
+        sys.stderr.write(
+            f"{row['name']:<60} {row['baseline']:>14.6g} -> {row['current']:>14.6g}{unit} "
+            f"(x{row['ratio']}){flag}\n"
+        )
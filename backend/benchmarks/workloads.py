@@ -0,0 +1,123 @@
+"""
+Synthetic workloads - workflow graphs, variables and model lists of any size
+"""
+
+import csv
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from services.workflow_runner import execute_node
+
+# Command node types handled by execute_node
+NODE_TYPES = [
+    'import', 'cleanModel', 'createView', 'addModelToView', 'removeModelFromView',
+    'deleteModelsFromView', 'createSharedModel', 'triangulateManualOption',
+    'tinFunction', 'runFunction', 'ifFunctionExists', 'renameModel',
+    'getTotalSurfaceArea', 'trimeshVolumeReport', 'volumeTinToTin',
+    'convertLinesToVariable', 'createContourSmoothLabel', 'drapeToTin',
+    'runOrCreateContours', 'createTrimeshFromTin', 'addComment', 'addLabel',
+    'runOrCreateMtf', 'createApplyMtf', 'applyMtf', 'createMtfFile',
+    'createTemplateFile',
+]
+
+# Node data that makes nodes resolve variables the way real graphs do
+_TEMPLATED_DATA = {
+    'comments': '{model_name} {discipline}',
+    'commentName': '{model_name}',
+    'labelName': 'LABEL_{model_name}',
+    'modifiedVariable': '{model_name_spaces}',
+    'prefix': '{prefix}',
+    'discipline': 'discipline',
+}
+
+
+def usable_node_types(output_folder: str) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Probe every node type once with default data
+
+    Returns:
+        Tuple of (node types that execute, {node type: error} for those that fail)
+    """
+    usable, failing = [], {}
+    for node_type in NODE_TYPES:
+        try:
+            execute_node({'id': 'probe', 'type': node_type, 'data': {}}, 'PROBE-01', [], {}, [], output_folder)
+        except Exception as e:
+            failing[node_type] = f"{type(e).__name__}: {e}"
+        else:
+            usable.append(node_type)
+    return usable, failing
+
+
+def make_graph(node_count: int, node_types: Sequence[str], seed: int = 0) -> Dict[str, Any]:
+    """
+    Build a linear workflow graph of node_count command nodes
+
+    Node types are used round-robin (shuffled with seed) so every type is
+    present once the graph is at least as large as the type list.
+    """
+    rng = random.Random(seed)
+    order = list(node_types)
+    rng.shuffle(order)
+
+    nodes: List[Dict[str, Any]] = [{'id': 'models', 'type': 'excelModels', 'data': {}}]
+    edges: List[Dict[str, Any]] = []
+    previous = 'models'
+    for i in range(node_count):
+        node_id = f"n{i}"
+        data = {key: value for key, value in _TEMPLATED_DATA.items() if rng.random() < 0.5}
+        nodes.append({'id': node_id, 'type': order[i % len(order)], 'data': data})
+        edges.append({'id': f"e{i}", 'source': previous, 'target': node_id})
+        previous = node_id
+    nodes.append({'id': 'output', 'type': 'chainFileOutput', 'data': {'modelType': 'Model'}})
+    edges.append({'id': 'e_out', 'source': previous, 'target': 'output'})
+    return {'nodes': nodes, 'edges': edges}
+
+
+def make_variables() -> List[Dict[str, Any]]:
+    """Variables referenced by the templated node data"""
+    return [
+        {'name': 'discipline', 'value': 'CIV', 'scope': 'per-run'},
+        {'name': 'prefix', 'value': 'BM_', 'scope': 'per-run'},
+        {'name': 'project_folder', 'value': 'C:/Projects/Benchmark', 'scope': 'per-run'},
+    ]
+
+
+def model_names(rows: int) -> List[str]:
+    """Deterministic model names in the project's naming style"""
+    return [f"NWP-{i // 1000:03d}-C-NWA-M2D-{i % 100:02d}-COY-CFN-{i:06d}" for i in range(rows)]
+
+
+def write_model_list(path: Union[str, Path], rows: int, file_format: Optional[str] = None) -> Path:
+    """
+    Write a model list with a header row and rows model names
+
+    Args:
+        path: Destination file
+        rows: Number of models
+        file_format: 'xlsx' or 'csv' (default: from the file extension)
+
+    Returns:
+        The written path
+    """
+    path = Path(path)
+    file_format = file_format or path.suffix.lstrip('.').lower()
+    names = model_names(rows)
+    if file_format == 'csv':
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Model Name', 'Discipline'])
+            writer.writerows([name, 'CIV'] for name in names)
+    elif file_format == 'xlsx':
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Models')
+        sheet.append(['Model Name', 'Discipline'])
+        for name in names:
+            sheet.append([name, 'CIV'])
+        workbook.save(path)
+    else:
+        raise ValueError(f"Unsupported model list format: {file_format}")
+    return path
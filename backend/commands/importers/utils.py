@@ -1,8 +1,8 @@
 """
 Utility functions for file importers
 """
-import unicodedata
 from typing import Union
+from utils.unicode_text import normalize_text
 
 
 def normalize_file_path(file_path: Union[str, None]) -> Union[str, None]:
@@ -15,11 +15,6 @@ def normalize_file_path(file_path: Union[str, None]) -> Union[str, None]:
     Returns:
         Normalized file path string
     """
-    if isinstance(file_path, str):
-        # Normalize Unicode characters using NFKC normalization
-        normalized = unicodedata.normalize('NFKC', file_path)
-        # Replace en-dash with regular hyphen to prevent encoding issues
-        normalized = normalized.replace('–', '-')
-        return normalized
-    return file_path
+    # NFKC normalization plus en-dash replacement; ASCII paths pass straight through
+    return normalize_text(file_path)
 
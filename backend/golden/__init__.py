@@ -0,0 +1,9 @@
+"""
+Golden corpus - Checked-in workflow graphs, variables and model lists with the
+exact chain files the engine is expected to generate for them
+
+Run from the backend folder:
+
+    python -m golden.harness            # compare the current engine to the corpus
+    python -m golden.harness --update   # re-record expected outputs after an intended change
+"""
@@ -0,0 +1,273 @@
+"""
+Golden harness - runs every corpus case through the engine and compares the
+output byte for byte with the checked-in expected files
+
+Each case is a folder under golden/cases/ with a case.json:
+
+    {
+        "description": "...",
+        "graph": "graph.json",        # workflow graph, relative to the case folder
+        "variables": [...],           # variable bindings as sent to /api/workflow/run
+        "model_list": "models.csv",   # model list, relative to the case folder
+        "column": 0                   # model name column (optional)
+    }
+
+Expected outputs live in the case's expected/ folder: the chain files plus any
+files written as a side effect (.mtf, .tpl). A case whose run is expected to
+fail has an error.txt with the exception instead. Cases run in parallel, one
+process each; a changed chain file is diffed line by line and every changed
+line is attributed to the node that generated it.
+
+Usage (from the backend folder):
+
+    python -m golden.harness [--case NAME ...] [--workers N] [--update]
+"""
+
+import argparse
+import difflib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from commands.metadata import generate_chain_closing
+from services.workflow_runner import (
+    compile_workflow,
+    execute_node,
+    load_model_list,
+    row_column_vars,
+    run_workflow,
+    uses_row_columns,
+)
+
+CASES_DIR = Path(__file__).resolve().parent / 'cases'
+EXPECTED_DIR = 'expected'
+ERROR_FILE = 'error.txt'
+
+# Label for the header, meta data, wrapper and closing lines around the commands
+SCAFFOLDING = 'scaffolding'
+
+
+def load_case(case_dir: Path) -> Dict[str, Any]:
+    """Read a case.json and resolve its graph and model list paths"""
+    with open(case_dir / 'case.json', 'r', encoding='utf-8') as f:
+        case = json.load(f)
+    with open(case_dir / case['graph'], 'r', encoding='utf-8') as f:
+        case['graph'] = json.load(f)
+    case['model_list'] = str((case_dir / case['model_list']).resolve())
+    case.setdefault('variables', [])
+    case.setdefault('column', 0)
+    return case
+
+
+def read_outputs(*folders: Path) -> Dict[str, bytes]:
+    """Read every file in the given folders as {file name: bytes}"""
+    outputs = {}
+    for folder in folders:
+        for path in sorted(folder.iterdir()):
+            if path.is_file():
+                outputs[path.name] = path.read_bytes()
+    return outputs
+
+
+def generate_outputs(case_dir: Path) -> Dict[str, Any]:
+    """
+    Run one case through the engine in a scratch folder
+
+    Returns:
+        Dict with 'files' ({file name: bytes}) and 'error' (None or "Type: message")
+    """
+    case = load_case(case_dir)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='pychain-golden-') as tmp:
+        output_folder = Path(tmp) / 'output'
+        work_dir = Path(tmp) / 'work'
+        output_folder.mkdir()
+        work_dir.mkdir()
+        # createMtfFile writes into the working directory; its files are part of the output
+        # (the model list cache folder written there is not)
+        os.chdir(work_dir)
+        try:
+            run_workflow(case['model_list'], case['graph'], case['variables'], str(output_folder), case['column'])
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            os.chdir(cwd)
+        files = {} if error else read_outputs(output_folder, work_dir)
+    return {'files': files, 'error': error}
+
+
+def expected_outputs(case_dir: Path) -> Dict[str, Any]:
+    """Read the checked-in outputs of a case, in the same shape as generate_outputs"""
+    error_path = case_dir / ERROR_FILE
+    if error_path.exists():
+        return {'files': {}, 'error': error_path.read_text(encoding='utf-8').strip()}
+    expected_dir = case_dir / EXPECTED_DIR
+    return {'files': read_outputs(expected_dir) if expected_dir.exists() else {}, 'error': None}
+
+
+def record_outputs(case_dir: Path, outputs: Dict[str, Any]) -> None:
+    """Replace the expected outputs of a case with the given outputs"""
+    expected_dir = case_dir / EXPECTED_DIR
+    shutil.rmtree(expected_dir, ignore_errors=True)
+    error_path = case_dir / ERROR_FILE
+    if error_path.exists():
+        error_path.unlink()
+
+    if outputs['error']:
+        error_path.write_text(outputs['error'] + '\n', encoding='utf-8')
+        return
+    expected_dir.mkdir()
+    for name, data in outputs['files'].items():
+        (expected_dir / name).write_bytes(data)
+
+
+def line_sources(case: Dict[str, Any], model_name: str, text: str) -> List[str]:
+    """
+    Label every line of a generated chain file with the node that produced it
+
+    The commands are regenerated node by node for the model and located in
+    the file; lines outside them are scaffolding.
+
+    Returns:
+        One "nodeType (node id)" or SCAFFOLDING label per line of text
+    """
+    graph, variables = case['graph'], case['variables']
+    nodes, edges = graph.get('nodes', []), graph.get('edges', [])
+    per_run_vars = {v.get('name'): v.get('value') for v in variables if v.get('scope') == 'per-run'}
+
+    chunks = []
+    with tempfile.TemporaryDirectory(prefix='pychain-golden-') as tmp:
+        # Node side effects and the model list cache write relative to the working directory
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            if uses_row_columns(graph, variables):
+                model_names, row_columns = load_model_list(case['model_list'], case['column'], with_row_columns=True)
+                if model_name in model_names:
+                    per_run_vars.update(row_column_vars(row_columns, model_names.index(model_name)))
+            for node in compile_workflow(nodes, edges):
+                lines: List[str] = []
+                execute_node(node, model_name, variables, per_run_vars, lines, tmp)
+                if lines:
+                    chunks.append((f"{node.get('type')} ({node.get('id')})", '\n'.join(lines).count('\n') + 1))
+        finally:
+            os.chdir(cwd)
+
+    labels = [SCAFFOLDING] * (text.count('\n') + 1)
+    closing = '\n'.join(generate_chain_closing())
+    commands_end = text.rfind('\n' + closing) if closing else len(text)
+    commands_lines = sum(count for _, count in chunks)
+    line = text[:max(commands_end, 0)].count('\n') + 1 - commands_lines
+    if line < 0:
+        return labels
+    for label, count in chunks:
+        labels[line:line + count] = [label] * count
+        line += count
+    return labels[:text.count('\n') + 1]
+
+
+def diff_sources(case: Dict[str, Any], model_name: str, expected: bytes, actual: bytes) -> Counter:
+    """Count changed lines of a chain file per node that generated them"""
+    expected_lines = expected.decode('utf-8', errors='replace').split('\n')
+    actual_text = actual.decode('utf-8', errors='replace')
+    actual_lines = actual_text.split('\n')
+    labels = line_sources(case, model_name, actual_text)
+
+    changed: Counter = Counter()
+    matcher = difflib.SequenceMatcher(None, expected_lines, actual_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        if j2 > j1:
+            changed.update(labels[j1:j2])
+        else:
+            # Lines only removed: blame the node at that point of the file
+            changed[labels[min(j1, len(labels) - 1)]] += i2 - i1
+    return changed
+
+
+def compare_case(case_dir: Path, actual: Dict[str, Any]) -> Tuple[List[str], Counter]:
+    """
+    Compare generated outputs with the expected ones
+
+    Returns:
+        Tuple of (report lines, empty when the outputs match byte for byte;
+        changed chain file lines per node type)
+    """
+    by_type: Counter = Counter()
+    expected = expected_outputs(case_dir)
+    if expected['error'] or actual['error']:
+        if expected['error'] == actual['error']:
+            return [], by_type
+        return [f"error: expected {expected['error']!r}, got {actual['error']!r}"], by_type
+
+    report = []
+    case = None
+    for name in sorted(set(expected['files']) | set(actual['files'])):
+        if name not in actual['files']:
+            report.append(f"{name}: missing")
+        elif name not in expected['files']:
+            report.append(f"{name}: unexpected")
+        elif expected['files'][name] != actual['files'][name]:
+            if not name.endswith('.chain'):
+                report.append(f"{name}: differs")
+                continue
+            case = case or load_case(case_dir)
+            changed = diff_sources(case, name[:-len('.chain')], expected['files'][name], actual['files'][name])
+            sources = ', '.join(f"{label} x{count}" for label, count in changed.most_common())
+            report.append(f"{name}: {sum(changed.values())} lines differ - {sources}")
+            for label, count in changed.items():
+                by_type[label.split(' ', 1)[0]] += count
+    return report, by_type
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare the engine's output with the golden corpus")
+    parser.add_argument('--case', nargs='+', help="Only run these cases")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Cases run at the same time")
+    parser.add_argument('--update', action='store_true', help="Re-record the expected outputs instead of comparing")
+    args = parser.parse_args(argv)
+
+    case_dirs = sorted(path.parent for path in CASES_DIR.glob('*/case.json'))
+    if args.case:
+        case_dirs = [path for path in case_dirs if path.name in args.case]
+    if not case_dirs:
+        sys.stderr.write("No golden cases found\n")
+        return 1
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        results = dict(zip(case_dirs, executor.map(generate_outputs, case_dirs)))
+
+    if args.update:
+        for case_dir, outputs in results.items():
+            record_outputs(case_dir, outputs)
+            print(f"{case_dir.name}: recorded {len(outputs['files'])} files" + (" (error)" if outputs['error'] else ""))
+        return 0
+
+    failed = 0
+    by_type: Counter = Counter()
+    for case_dir, outputs in results.items():
+        report, changed = compare_case(case_dir, outputs)
+        print(f"{case_dir.name}: {'FAIL' if report else 'ok'}")
+        for line in report:
+            print(f"    {line}")
+        by_type.update(changed)
+        failed += bool(report)
+
+    if by_type:
+        print("Changed lines by node type:")
+        for label, count in by_type.most_common():
+            print(f"    {label}: {count}")
+    print(f"{len(results) - failed} of {len(results)} cases match")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
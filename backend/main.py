@@ -3,22 +3,43 @@ PyChain API
 FastAPI backend for processing DWG/DGN/IFC files and generating 12d Model chain files
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 from contextlib import asynccontextmanager
 import os
 import uuid
 import asyncio
 from pathlib import Path
+from urllib.parse import quote
 import logging
-import zipfile
+import shutil
+import threading
 from commands.importers import normalize_file_path
-from services.workflow_runner import run_workflow
-from utils.data_loader import load_naming_data
+from services.workflow_runner import run_workflow, run_workbook, run_batch, workflow_names, WorkflowCancelled
+from utils.data_loader import load_naming_data, MODEL_LIST_EXTENSIONS
+from utils.file_upload import UploadLimitMiddleware, UploadTooLargeError
+from utils.zip_stream import iter_zip_stream, iter_zip_entry
+from services.blob_store import BlobStore, is_valid_digest
+from services.run_index import RunIndex, run_key
+from services.result_archive import ResultArchiveWriter, MANIFEST_NAME, resolve_compression
+from services.run_stats import RunStats
+from services.profiler import ProfilerBusyError, profile_call, profiling_slot, replay_job
+from services.tracing import SessionTrace, optional_span, start_trace
+from services.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    DURATION_BUCKETS,
+    SIZE_BUCKETS,
+    MetricsMiddleware,
+    Registry,
+)
+import functools
+import hmac
 import json
+import tempfile
+import time
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -30,6 +51,22 @@ OUTPUT_DIR = Path("output")
 UPLOAD_DIR.mkdir(exist_ok=True)
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+# Content-addressed store for uploads (kept across restarts for deduplication,
+# least recently used blobs evicted beyond BLOB_STORE_MAX_BYTES; 0 disables the limit)
+BLOB_STORE_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_BYTES", str(20 * 1024 * 1024 * 1024)))
+blob_store = BlobStore(UPLOAD_DIR / "blobs", max_bytes=BLOB_STORE_MAX_BYTES)
+
+# Maximum total upload size per request in bytes (0 disables the limit)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Allowance on top of MAX_UPLOAD_BYTES for the graph, variables and multipart framing
+REQUEST_BODY_SLACK_BYTES = 16 * 1024 * 1024
+
+# Token for the /api/admin endpoints (unset disables them)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_DIR = OUTPUT_DIR / "profiles"
+# Number of profile stats files kept for download (oldest deleted first)
+PROFILE_KEEP = max(1, int(os.getenv("PROFILE_KEEP", "20")))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -38,13 +75,15 @@ async def lifespan(app: FastAPI):
     logger.info("Starting PyChain API")
     
     # Clean up old files (optional)
-    for directory in [UPLOAD_DIR, OUTPUT_DIR]:
+    for directory in [UPLOAD_DIR, OUTPUT_DIR, PROFILE_DIR, blob_store.tmp_dir]:
         for file_path in directory.glob("*"):
             if file_path.is_file():
                 try:
                     file_path.unlink()
                 except Exception:
                     pass
+    # Session links are gone, so every blob is now a candidate for eviction
+    blob_store.evict()
     
     yield
     
@@ -73,11 +112,255 @@ app.add_middleware(
 )
 
 # In-memory storage for session management
-# In-memory storage for session management
+processing_sessions = {}
 workflow_sessions = {}
 
+# Run key -> session id, so identical workflow requests are only processed once
+run_index = RunIndex()
+
+# Session id -> cancel signal of its running workflow job
+cancel_events: Dict[str, threading.Event] = {}
+
+# Held while a cancel request or a finishing job decides a session's final status
+session_status_lock = threading.Lock()
+
+# Session id -> trace of a queued or running workflow job (when tracing is on)
+session_traces: Dict[str, SessionTrace] = {}
+
+# Profile id -> cProfile stats file of an admin profiling run, oldest first
+profiles: Dict[str, Path] = {}
+
+
+def keep_profile(profile_id: str, stats_path: Path) -> None:
+    """Remember a profile's stats file, deleting the oldest beyond PROFILE_KEEP"""
+    profiles[profile_id] = stats_path
+    while len(profiles) > PROFILE_KEEP:
+        oldest = next(iter(profiles))
+        profiles.pop(oldest).unlink(missing_ok=True)
+
+
+def session_counts() -> Dict[Tuple[str, ...], float]:
+    """Count workflow sessions by status, read when /metrics is scraped"""
+    counts: Dict[Tuple[str, ...], float] = {}
+    for session in list(workflow_sessions.values()):
+        key = (session.get("status", "unknown"),)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+# Prometheus metrics served at /metrics
+metrics = Registry()
+request_latency = metrics.histogram(
+    "pychain_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"),
+)
+jobs_queued = metrics.gauge("pychain_jobs_queued", "Workflow jobs accepted but not started yet")
+jobs_active = metrics.gauge("pychain_jobs_active", "Workflow jobs currently running")
+jobs_total = metrics.counter("pychain_jobs_total", "Finished workflow jobs by kind and final status", ("kind", "status"))
+models_generated = metrics.counter(
+    "pychain_models_generated_total", "Chain files generated (models per second is its rate)",
+)
+chain_bytes_written = metrics.counter("pychain_chain_bytes_written_total", "Bytes of chain files written")
+zip_duration = metrics.histogram(
+    "pychain_zip_duration_seconds", "Time spent finishing the result archive of a job", buckets=DURATION_BUCKETS,
+)
+upload_size = metrics.histogram("pychain_upload_size_bytes", "Size of each uploaded file", buckets=SIZE_BUCKETS)
+metrics.gauge("pychain_sessions", "Workflow sessions held in memory by status", ("status",), callback=session_counts)
+
+# Refuse oversized bodies before Starlette spools them to disk
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES + REQUEST_BODY_SLACK_BYTES if MAX_UPLOAD_BYTES > 0 else None,
+)
+app.add_middleware(MetricsMiddleware, histogram=request_latency)
+
+
+def metered_job(kind: str):
+    """
+    Track a background job function (session_id first) in the job gauges and counter
+
+    With tracing on, the time the job waited in the queue and the job itself
+    are recorded as spans and the session's trace is finished.
+    """
+    def decorate(job: Callable) -> Callable:
+        @functools.wraps(job)
+        def run(session_id: str, *args, **kwargs):
+            jobs_queued.dec()
+            jobs_active.inc()
+            trace = session_traces.get(session_id)
+            session = workflow_sessions.get(session_id)
+            if trace is not None and session is not None:
+                trace.record("queue", time.time() - session["queued_at"])
+            start = time.perf_counter()
+            try:
+                return job(session_id, *args, **kwargs)
+            finally:
+                jobs_active.dec()
+                session = workflow_sessions.get(session_id)
+                status = session["status"] if session else "deleted"
+                jobs_total.inc(kind=kind, status=status)
+                if trace is not None:
+                    trace.record("job", time.perf_counter() - start, kind=kind, status=status)
+                    trace.finish(status)
+                    session_traces.pop(session_id, None)
+        return run
+    return decorate
+
+
+
+
+def is_truthy(value: Optional[str]) -> bool:
+    """Interpret a boolean form field ("1", "true" or "yes" mean true)"""
+    return str(value or "").strip().lower() in ("1", "true", "yes")
+
+
+def parse_column_index(selected_column_index: Optional[str]) -> int:
+    """Convert the selected_column_index form field to a 0-based column index"""
+    try:
+        column_index = int(selected_column_index or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="selected_column_index must be an integer")
+    if column_index < 0:
+        raise HTTPException(status_code=400, detail="selected_column_index must not be negative")
+    return column_index
+
+
+def parse_part_size(max_part_mb: Optional[str]) -> Optional[int]:
+    """Convert the max_part_mb form field to bytes (None when results are not split)"""
+    try:
+        max_part_bytes = int(float(max_part_mb or 0) * 1024 * 1024)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="max_part_mb must be a number")
+    if max_part_bytes < 0:
+        raise HTTPException(status_code=400, detail="max_part_mb must not be negative")
+    return max_part_bytes or None
+
+
+def parse_compression(compression: Optional[str], compression_level: Optional[str]) -> Tuple[str, Optional[int]]:
+    """Validate the compression form fields, returning (method name, level or None)"""
+    try:
+        level = int(compression_level) if compression_level not in (None, "") else None
+        resolve_compression(compression, level)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return (compression or "deflate").strip().lower(), level
+
+
+def remaining_upload_budget(bytes_used: int) -> Optional[int]:
+    """Return how many more bytes the current request may upload (None for no limit)"""
+    if MAX_UPLOAD_BYTES <= 0:
+        return None
+    return MAX_UPLOAD_BYTES - bytes_used
 
 
+def model_list_name(
+    excel_file: Optional[UploadFile],
+    excel_file_name: Optional[str],
+    excel_file_hash: Optional[str] = None,
+) -> str:
+    """
+    Return the file name of a request's model list, uploaded or referenced by hash
+
+    Raises:
+        HTTPException: 400 if there is no model list or its extension is not supported
+    """
+    if not excel_file and not excel_file_hash:
+        raise HTTPException(status_code=400, detail="No Excel file uploaded")
+    excel_name = excel_file.filename if excel_file else (excel_file_name or "models.xlsx")
+    if not excel_name.lower().endswith(MODEL_LIST_EXTENSIONS):
+        raise HTTPException(
+            status_code=400,
+            detail="Model list must be .xlsx, .csv, .parquet, .json, .ndjson or .jsonl format",
+        )
+    return excel_name
+
+
+async def read_workflows(workflows: UploadFile) -> Tuple[List[Dict], List[str]]:
+    """
+    Read and check the workflows JSON of a batch
+
+    Returns:
+        Tuple of (workflow entries, their names)
+
+    Raises:
+        HTTPException: 400 if it is not valid JSON or an entry is malformed
+    """
+    try:
+        workflows_json = json.loads((await workflows.read()).decode('utf-8'))
+        return workflows_json, workflow_names(workflows_json)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid workflows: {e}")
+
+
+async def receive_upload(
+    filename: str,
+    upload: Optional[UploadFile] = None,
+    file_hash: Optional[str] = None,
+    bytes_used: int = 0,
+) -> Tuple[str, int]:
+    """
+    Store an upload in the blob store, or check a reference to a stored file
+
+    Either the file bytes or the SHA-256 hash of a previously uploaded file
+    must be given.
+
+    Returns:
+        Tuple of (SHA-256 digest, bytes received in this request)
+    """
+    received = 0
+    if upload is not None:
+        file_hash, received, _ = await blob_store.save_upload(
+            upload, remaining_upload_budget(bytes_used)
+        )
+        upload_size.observe(received)
+    elif not file_hash or not is_valid_digest(file_hash.lower()):
+        raise HTTPException(status_code=400, detail=f"Invalid file hash for {filename}")
+    else:
+        file_hash = file_hash.lower()
+        if not blob_store.exists(file_hash):
+            raise HTTPException(status_code=404, detail=f"No stored file with hash {file_hash}")
+        # Keep it from eviction until the session links it
+        blob_store.touch(file_hash)
+    return file_hash, received
+
+
+def link_session_file(session_id: str, filename: str, file_hash: str) -> Path:
+    """Link a stored blob to uploads/<session_id>_<filename>"""
+    session_path = UPLOAD_DIR / f"{session_id}_{os.path.basename(filename)}"
+    try:
+        blob_store.link_to(file_hash, session_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No stored file with hash {file_hash}; upload it again")
+    return session_path
+
+
+async def store_session_file(
+    session_id: str,
+    filename: str,
+    upload: Optional[UploadFile] = None,
+    file_hash: Optional[str] = None,
+    bytes_used: int = 0,
+) -> Tuple[Path, str, int]:
+    """
+    Store an upload (or reference an already stored file) for a session
+
+    Returns:
+        Tuple of (session file path, SHA-256 digest, bytes received in this request)
+    """
+    file_hash, received = await receive_upload(filename, upload, file_hash, bytes_used)
+    return link_session_file(session_id, filename, file_hash), file_hash, received
+
+
+def reused_session_response(session_id: str) -> Dict:
+    """Response for a request that matched an existing completed or in-flight run"""
+    session = workflow_sessions[session_id]
+    return {
+        "session_id": session_id,
+        "status": session["status"],
+        "excel_hash": session.get("excel_hash"),
+        "reused": True,
+        "message": "Identical run already exists",
+    }
+
 
 @app.get("/")
 async def root():
@@ -85,49 +368,92 @@ async def root():
     return {"message": "PyChain API is running"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: request latency, jobs, generation throughput, ZIP time, uploads and sessions"""
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/api/uploads/{file_hash}")
+async def get_stored_upload(file_hash: str):
+    """
+    Check whether a file with this SHA-256 hash is already stored
+
+    Clients can skip re-uploading known files and pass the hash instead.
+    """
+    file_hash = file_hash.lower()
+    if not is_valid_digest(file_hash):
+        raise HTTPException(status_code=400, detail="Invalid file hash")
+    size = blob_store.size(file_hash)
+    return {"sha256": file_hash, "exists": size is not None, "size": size}
+
+
 @app.post("/api/upload")
 async def upload_files(
     background_tasks: BackgroundTasks,
-    excel_file: UploadFile = File(...),
-    dwg_ifc_files: List[UploadFile] = File(...)
+    excel_file: Optional[UploadFile] = File(None),
+    dwg_ifc_files: Optional[List[UploadFile]] = File(None),
+    excel_file_hash: Optional[str] = Form(None),
+    excel_file_name: Optional[str] = Form(None),
+    dwg_ifc_hashes: str = Form("[]"),
 ):
     """
     Upload and validate files
+    
+    Files already known to the server can be referenced instead of re-uploaded:
+    pass excel_file_hash/excel_file_name for the Excel file and dwg_ifc_hashes as a
+    JSON list of {"sha256": ..., "filename": ...} objects.
     """
     try:
+        dwg_ifc_files = dwg_ifc_files or []
+        known_files = json.loads(dwg_ifc_hashes or "[]")
+        
         # Validate inputs
-        if not excel_file:
+        if not excel_file and not excel_file_hash:
             raise HTTPException(status_code=400, detail="No Excel file uploaded")
         
-        if not excel_file.filename.endswith('.xlsx'):
+        excel_name = excel_file.filename if excel_file else (excel_file_name or "models.xlsx")
+        if not excel_name.endswith('.xlsx'):
             raise HTTPException(status_code=400, detail="Excel file must be .xlsx format")
         
-        if not dwg_ifc_files:
+        if not dwg_ifc_files and not known_files:
             raise HTTPException(status_code=400, detail="No DWG/DGN/IFC files uploaded")
         
         # Validate file types
         valid_extensions = {'.dwg', '.dgn', '.ifc'}
-        for file in dwg_ifc_files:
-            file_ext = os.path.splitext(file.filename)[1].lower()
+        file_names = [file.filename for file in dwg_ifc_files]
+        file_names += [str(known.get('filename', '')) for known in known_files]
+        for filename in file_names:
+            file_ext = os.path.splitext(filename)[1].lower()
             if file_ext not in valid_extensions:
                 raise HTTPException(
                     status_code=400, 
-                    detail=f"File {file.filename} is not a valid DWG, DGN, or IFC file"
+                    detail=f"File {filename} is not a valid DWG, DGN, or IFC file"
                 )
         
         # Generate unique session ID
         session_id = str(uuid.uuid4())
         
-        # Save uploaded files
-        excel_path = UPLOAD_DIR / f"{session_id}_{excel_file.filename}"
-        content = await excel_file.read()
-        excel_path.write_bytes(content)
+        # Store uploaded files (identical content is only stored once)
+        excel_path, excel_hash, bytes_used = await store_session_file(
+            session_id, excel_name, excel_file, excel_file_hash
+        )
         
         dwg_ifc_paths = []
+        file_hashes = {excel_name: excel_hash}
         for file in dwg_ifc_files:
-            file_path = UPLOAD_DIR / f"{session_id}_{file.filename}"
-            content = await file.read()
-            file_path.write_bytes(content)
+            file_path, file_hash, size = await store_session_file(
+                session_id, file.filename, file, bytes_used=bytes_used
+            )
+            bytes_used += size
+            file_hashes[file.filename] = file_hash
+            dwg_ifc_paths.append(str(file_path))
+        for known in known_files:
+            filename = str(known.get('filename', ''))
+            file_path, file_hash, _ = await store_session_file(
+                session_id, filename, file_hash=known.get('sha256')
+            )
+            file_hashes[filename] = file_hash
             dwg_ifc_paths.append(str(file_path))
         
         # Initialize session
@@ -135,6 +461,7 @@ async def upload_files(
             "status": "uploaded",
             "excel_file": str(excel_path),
             "dwg_ifc_files": dwg_ifc_paths,
+            "file_hashes": file_hashes,
             "results": None,
             "error": None
         }
@@ -144,11 +471,15 @@ async def upload_files(
         return {
             "session_id": session_id,
             "status": "uploaded",
-            "excel_file": excel_file.filename,
-            "dwg_ifc_count": len(dwg_ifc_files),
+            "excel_file": excel_name,
+            "dwg_ifc_count": len(dwg_ifc_paths),
+            "total_bytes": bytes_used,
+            "file_hashes": file_hashes,
             "message": "Files uploaded successfully"
         }
         
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
@@ -163,44 +494,107 @@ async def upload_files(
 @app.post("/api/workflow/run")
 async def run_workflow_endpoint(
     background_tasks: BackgroundTasks,
-    excel_file: UploadFile = File(...),
+    excel_file: Optional[UploadFile] = File(None),
     workflow_graph: UploadFile = File(...),
     variables: UploadFile = File(...),
     selected_column_index: str = Form("0"),
+    excel_file_hash: Optional[str] = Form(None),
+    excel_file_name: Optional[str] = Form(None),
+    all_sheets: str = Form("false"),
+    force: str = Form("false"),
+    max_part_mb: str = Form("0"),
+    compression: str = Form("deflate"),
+    compression_level: Optional[str] = Form(None),
 ):
     """
     Run a workflow graph
+    
+    With all_sheets=true every sheet of an .xlsx workbook is run, one after
+    another from a single parse of the workbook, and each sheet's chain files
+    are placed in their own folder of the ZIP.
+    
+    A request identical to an earlier one (same model list content, graph
+    ignoring layout, variables and options) returns the existing completed or
+    in-flight session instead of starting new work, unless force=true.
+    
+    With max_part_mb > 0 the results are split into ZIP parts of at most that
+    size, each downloadable from /api/workflow/parts as soon as it is written.
+    compression picks the ZIP codec: stored, deflate (compression_level 0-9),
+    fast (deflate level 1), bzip2 or lzma.
+    
+    The model list (Excel, CSV, Parquet or JSON/NDJSON) can be uploaded, or
+    referenced by the SHA-256 hash of a previously uploaded file via
+    excel_file_hash (and optionally excel_file_name).
     """
     try:
-        if not excel_file.filename.endswith('.xlsx'):
-            raise HTTPException(status_code=400, detail="Excel file must be .xlsx format")
+        excel_name = model_list_name(excel_file, excel_file_name, excel_file_hash)
+        
+        run_all_sheets = is_truthy(all_sheets)
+        if run_all_sheets and not excel_name.lower().endswith('.xlsx'):
+            raise HTTPException(status_code=400, detail="Multi-sheet runs require an .xlsx workbook")
+        max_part_bytes = parse_part_size(max_part_mb)
+        compression, level = parse_compression(compression, compression_level)
         
         # Read and parse workflow graph and variables
         workflow_content = await workflow_graph.read()
         variables_content = await variables.read()
         workflow_json = json.loads(workflow_content.decode('utf-8'))
         variables_json = json.loads(variables_content.decode('utf-8'))
-        column_index = int(selected_column_index)
-        
-        # Generate unique session ID
+        column_index = parse_column_index(selected_column_index)
         session_id = str(uuid.uuid4())
+        trace = start_trace(session_id)
+        try:
+            # Store uploaded Excel file (identical content is only stored once)
+            with optional_span(trace, "upload", file=excel_name):
+                excel_hash, _ = await receive_upload(excel_name, excel_file, excel_file_hash)
         
-        # Save uploaded Excel file
-        excel_path = UPLOAD_DIR / f"{session_id}_{excel_file.filename}"
-        content = await excel_file.read()
-        excel_path.write_bytes(content)
+            # Identical requests reuse the existing completed or in-flight session
+            key = run_key(
+                excel_hash,
+                [{"workflow_graph": workflow_json, "variables": variables_json}],
+                column_index,
+                all_sheets=run_all_sheets,
+                max_part_bytes=max_part_bytes,
+                compression=compression,
+                compression_level=level,
+            )
+            existing_id = run_index.claim(key, session_id, workflow_sessions, force=is_truthy(force))
+            if existing_id:
+                if trace is not None:
+                    trace.finish("reused")
+                return reused_session_response(existing_id)
+            excel_path = link_session_file(session_id, excel_name, excel_hash)
+        except BaseException:
+            # Not queued (bad upload, client gone, link failed): end the trace here
+            run_index.forget(session_id)
+            if trace is not None:
+                trace.finish("error")
+            raise
         
         # Initialize session
         workflow_sessions[session_id] = {
             "status": "processing",
             "excel_file": str(excel_path),
+            "excel_hash": excel_hash,
+            "run_key": key,
             "workflow_graph": workflow_json,
             "variables": variables_json,
+            "selected_column_index": column_index,
+            "all_sheets": run_all_sheets,
+            "max_part_bytes": max_part_bytes,
+            "compression": compression,
+            "compression_level": level,
+            "published_files": [],
             "results": None,
             "error": None,
+            "queued_at": time.time(),
         }
         
         # Kick off background job
+        cancel_events[session_id] = threading.Event()
+        if trace is not None:
+            session_traces[session_id] = trace
+        jobs_queued.inc()
         background_tasks.add_task(
             run_workflow_job,
             session_id,
@@ -208,74 +602,456 @@ async def run_workflow_endpoint(
             workflow_json,
             variables_json,
             column_index,
+            excel_hash,
+            run_all_sheets,
         )
         
         return {
             "session_id": session_id,
             "status": "processing",
+            "excel_hash": excel_hash,
             "message": "Workflow started",
         }
         
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in workflow run: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def merge_grouped_results(
+    grouped_results: Dict[str, Tuple[List[str], Optional[str], List[Dict]]],
+) -> Tuple[List[str], str, List[Dict], Dict[str, Dict]]:
+    """
+    Combine per-sheet or per-graph run results into one file list
+
+    Returns:
+        Tuple of (generated files, project folder, file details, per-group summary)
+    """
+    generated_files, file_details, project_folder = [], [], ""
+    groups_summary = {}
+    for group_name, (group_files, group_project_folder, group_details) in grouped_results.items():
+        generated_files.extend(group_files)
+        file_details.extend(group_details)
+        project_folder = project_folder or group_project_folder
+        groups_summary[group_name] = {
+            "total_files": len(group_files),
+            "project_folder": group_project_folder or "",
+        }
+    return generated_files, project_folder, file_details, groups_summary
+
+
+def complete_workflow_session(
+    session_id: str,
+    output_folder: Path,
+    generated_files: List[str],
+    project_folder: Optional[str],
+    file_details: List[Dict],
+    groups_key: Optional[str] = None,
+    groups_summary: Optional[Dict[str, Dict]] = None,
+    archive: Optional[ResultArchiveWriter] = None,
+    stats: Optional[RunStats] = None,
+):
+    """
+    Package a finished run into its ZIP and mark the session completed
+    
+    ZIP paths are relative to the output folder, so multi-sheet and batch runs
+    keep one folder per sheet or graph. An index of the ZIP entries is kept
+    with the session so single files can be served without reopening the
+    archive. A cancel request that arrives before the session is marked
+    completed (including while the ZIP is written or closed) discards the
+    archive and raises WorkflowCancelled, so the session ends up cancelled.
+    
+    A parted archive has already been fed file by file during the run and is
+    only closed here.
+    
+    With stats, the ZIP time is recorded as the "zip" stage and the job's
+    stage and node timings are added to results.summary.
+    """
+    session = workflow_sessions[session_id]
+    cancel_event = cancel_events.get(session_id)
+    if archive is None:
+        archive = open_result_archive(session_id)
+    
+    # Create ZIP file
+    archive_names = [os.path.relpath(f, output_folder).replace(os.sep, '/') for f in generated_files]
+    zip_start = time.perf_counter()
+    if not archive.parted:
+        for file_path, archive_name in zip(generated_files, archive_names):
+            if cancel_event is not None and cancel_event.is_set():
+                archive.abort()
+                raise WorkflowCancelled(len(generated_files))
+            if os.path.exists(file_path):
+                archive.add(file_path, archive_name)
+    parts = archive.close()
+    zip_seconds = time.perf_counter() - zip_start
+    zip_duration.observe(zip_seconds)
+    if stats is not None:
+        stats.add_stage("zip", zip_seconds)
+    
+    # Look up results by archive name or by model name
+    model_index: Dict[str, List[str]] = {}
+    for detail, archive_name in zip(file_details, archive_names):
+        detail["archive_name"] = archive_name
+        model_name = os.path.splitext(os.path.basename(archive_name))[0]
+        model_index.setdefault(model_name, []).append(archive_name)
+    
+    results = {
+        "files": archive_names,
+        "file_details": file_details,
+        "zip_path": None if archive.parted else str(archive.path),
+        "zip_sha256": None if archive.parted or not parts else parts[0]["sha256"],
+        "summary": {
+            "total_files": len(generated_files),
+            "project_folder": project_folder or "",
+        },
+    }
+    if archive.parted:
+        results["parts"] = [part_summary(part) for part in parts]
+        results["manifest_path"] = str(archive.manifest_path)
+    if groups_key:
+        results["summary"][groups_key] = groups_summary or {}
+    if stats is not None:
+        results["summary"].update(stats.summary())
+    
+    # Update session, unless a cancel came in while finishing
+    with session_status_lock:
+        cancelled = (cancel_event is not None and cancel_event.is_set()) or session["status"] in ("cancelling", "cancelled")
+        if not cancelled:
+            session["archive_index"] = archive.entries
+            session["model_index"] = model_index
+            session["status"] = "completed"
+            session["results"] = results
+    if cancelled:
+        archive.abort()
+        raise WorkflowCancelled(len(generated_files))
+
+
+def part_summary(part: Dict) -> Dict:
+    """Public view of an archive part (the file list is in the manifest)"""
+    return {
+        "name": part["name"],
+        "size": part["size"],
+        "sha256": part["sha256"],
+        "files": len(part["files"]),
+    }
+
+
+def open_result_archive(session_id: str) -> ResultArchiveWriter:
+    """
+    Create the result archive writer for a session
+    
+    Sessions with max_part_bytes get size-bounded parts under
+    output/<session_id>_parts, listed in the session as each part is finished;
+    others get the single output/<session_id>_chain_files.zip.
+    """
+    session = workflow_sessions[session_id]
+    compression, compresslevel = resolve_compression(session.get("compression"), session.get("compression_level"))
+    max_part_bytes = session.get("max_part_bytes")
+    if max_part_bytes:
+        archive_parts = session.setdefault("archive_parts", [])
+        return ResultArchiveWriter(
+            OUTPUT_DIR / f"{session_id}_parts",
+            max_part_bytes,
+            on_part=archive_parts.append,
+            compression=compression,
+            compresslevel=compresslevel,
+        )
+    return ResultArchiveWriter(
+        OUTPUT_DIR / f"{session_id}_chain_files.zip",
+        compression=compression,
+        compresslevel=compresslevel,
+    )
+
+
+def session_file_publisher(
+    session_id: str,
+    output_folder: Path,
+    archive: Optional[ResultArchiveWriter] = None,
+) -> Callable[[str], None]:
+    """
+    Return a callback that publishes each chain file of a session as soon as it is written
+    
+    Published files are listed by their archive name (relative to the output
+    folder) and can be downloaded while the job is still running. Parted
+    archives are written as the files arrive.
+    """
+    published = workflow_sessions[session_id].setdefault("published_files", [])
+    
+    def publish(file_path: str):
+        models_generated.inc()
+        chain_bytes_written.inc(os.path.getsize(file_path))
+        archive_name = os.path.relpath(file_path, output_folder).replace(os.sep, '/')
+        if archive is not None and archive.parted:
+            archive.add(file_path, archive_name)
+        published.append(archive_name)
+    
+    return publish
+
+
+def cancel_workflow_session(
+    session_id: str,
+    output_folder: Path,
+    models_completed: int,
+    archive: Optional[ResultArchiveWriter] = None,
+    stats: Optional[RunStats] = None,
+):
+    """
+    Delete the partial output of a cancelled run and mark the session cancelled
+    
+    The timings gathered up to the cancel are kept as the session's summary.
+    """
+    if archive is not None:
+        archive.abort()
+    shutil.rmtree(output_folder, ignore_errors=True)
+    run_index.forget(session_id)
+    session = workflow_sessions.get(session_id)
+    if session is not None:
+        session["status"] = "cancelled"
+        session["models_completed"] = models_completed
+        if stats is not None:
+            session["summary"] = stats.summary()
+    logger.info(f"Workflow cancelled for session {session_id} after {models_completed} models")
+
+
+@metered_job("run")
 def run_workflow_job(
     session_id: str,
     excel_file_path: str,
     workflow_graph: Dict,
     variables: List[Dict],
     selected_column_index: int = 0,
+    excel_hash: Optional[str] = None,
+    all_sheets: bool = False,
 ):
     """
     Background processing job for workflow execution
     """
+    archive = None
     try:
         if session_id not in workflow_sessions:
             return
         
-        session = workflow_sessions[session_id]
-        
         # Create output directory for this session
         output_folder = OUTPUT_DIR / session_id
         output_folder.mkdir(exist_ok=True)
         
         # Run workflow
-        generated_files, project_folder, file_details = run_workflow(
+        cancel_event = cancel_events.get(session_id)
+        stats = RunStats(session_traces.get(session_id))
+        archive = open_result_archive(session_id)
+        on_file = session_file_publisher(session_id, output_folder, archive)
+        if all_sheets:
+            sheet_results = run_workbook(
+                excel_file_path,
+                workflow_graph,
+                variables,
+                str(output_folder),
+                selected_column_index=selected_column_index,
+                excel_hash=excel_hash,
+                cancel_event=cancel_event,
+                on_file=on_file,
+                stats=stats,
+            )
+            generated_files, project_folder, file_details, sheets_summary = merge_grouped_results(sheet_results)
+            complete_workflow_session(
+                session_id, output_folder, generated_files, project_folder, file_details,
+                "sheets", sheets_summary, archive, stats,
+            )
+        else:
+            generated_files, project_folder, file_details = run_workflow(
+                excel_file_path,
+                workflow_graph,
+                variables,
+                str(output_folder),
+                selected_column_index=selected_column_index,
+                excel_hash=excel_hash,
+                cancel_event=cancel_event,
+                on_file=on_file,
+                stats=stats,
+            )
+            complete_workflow_session(
+                session_id, output_folder, generated_files, project_folder, file_details,
+                archive=archive, stats=stats,
+            )
+        
+        logger.info(f"Workflow processing completed for session {session_id}")
+        
+    except WorkflowCancelled as e:
+        cancel_workflow_session(session_id, output_folder, e.completed, archive, stats)
+    except Exception as e:
+        if archive is not None:
+            archive.abort()
+        if session_id in workflow_sessions:
+            workflow_sessions[session_id]["status"] = "error"
+            workflow_sessions[session_id]["error"] = str(e)
+        logger.error(f"Error in workflow background processing: {e}", exc_info=True)
+    finally:
+        cancel_events.pop(session_id, None)
+
+
+@app.post("/api/workflow/batch")
+async def run_workflow_batch_endpoint(
+    background_tasks: BackgroundTasks,
+    workflows: UploadFile = File(...),
+    excel_file: Optional[UploadFile] = File(None),
+    selected_column_index: str = Form("0"),
+    excel_file_hash: Optional[str] = Form(None),
+    excel_file_name: Optional[str] = Form(None),
+    force: str = Form("false"),
+    max_part_mb: str = Form("0"),
+    compression: str = Form("deflate"),
+    compression_level: Optional[str] = Form(None),
+):
+    """
+    Run several workflow graphs against one model list in a single job
+    
+    workflows is a JSON list of {"name": ..., "workflow_graph": {...}, "variables": [...]}
+    entries. The model list is parsed once, the graphs run on a thread pool
+    (overlapping file I/O only) and the results are returned as one ZIP with
+    a folder per graph (or ZIP parts of at most max_part_mb), compressed as
+    set by compression/compression_level.
+    Identical batches reuse the existing session unless force=true.
+    """
+    try:
+        excel_name = model_list_name(excel_file, excel_file_name, excel_file_hash)
+        
+        workflows_json, names = await read_workflows(workflows)
+        column_index = parse_column_index(selected_column_index)
+        max_part_bytes = parse_part_size(max_part_mb)
+        compression, level = parse_compression(compression, compression_level)
+        
+        session_id = str(uuid.uuid4())
+        trace = start_trace(session_id)
+        try:
+            # Store uploaded model list (identical content is only stored once)
+            with optional_span(trace, "upload", file=excel_name):
+                excel_hash, _ = await receive_upload(excel_name, excel_file, excel_file_hash)
+        
+            # Identical requests reuse the existing completed or in-flight session
+            key = run_key(
+                excel_hash,
+                workflows_json,
+                column_index,
+                batch=True,
+                max_part_bytes=max_part_bytes,
+                compression=compression,
+                compression_level=level,
+            )
+            existing_id = run_index.claim(key, session_id, workflow_sessions, force=is_truthy(force))
+            if existing_id:
+                if trace is not None:
+                    trace.finish("reused")
+                return reused_session_response(existing_id)
+            excel_path = link_session_file(session_id, excel_name, excel_hash)
+        except BaseException:
+            # Not queued (bad upload, client gone, link failed): end the trace here
+            run_index.forget(session_id)
+            if trace is not None:
+                trace.finish("error")
+            raise
+        
+        # Initialize session
+        workflow_sessions[session_id] = {
+            "status": "processing",
+            "excel_file": str(excel_path),
+            "excel_hash": excel_hash,
+            "run_key": key,
+            "workflows": workflows_json,
+            "selected_column_index": column_index,
+            "max_part_bytes": max_part_bytes,
+            "compression": compression,
+            "compression_level": level,
+            "published_files": [],
+            "results": None,
+            "error": None,
+            "queued_at": time.time(),
+        }
+        
+        # Kick off background job
+        cancel_events[session_id] = threading.Event()
+        if trace is not None:
+            session_traces[session_id] = trace
+        jobs_queued.inc()
+        background_tasks.add_task(
+            run_batch_job,
+            session_id,
+            str(excel_path),
+            workflows_json,
+            column_index,
+            excel_hash,
+        )
+        
+        return {
+            "session_id": session_id,
+            "status": "processing",
+            "excel_hash": excel_hash,
+            "workflows": names,
+            "message": "Batch started",
+        }
+        
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in workflow batch: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@metered_job("batch")
+def run_batch_job(
+    session_id: str,
+    excel_file_path: str,
+    workflows: List[Dict],
+    selected_column_index: int = 0,
+    excel_hash: Optional[str] = None,
+):
+    """
+    Background processing job for batch workflow execution
+    """
+    archive = None
+    try:
+        if session_id not in workflow_sessions:
+            return
+        
+        # Create output directory for this session
+        output_folder = OUTPUT_DIR / session_id
+        output_folder.mkdir(exist_ok=True)
+        
+        stats = RunStats(session_traces.get(session_id))
+        archive = open_result_archive(session_id)
+        batch_results = run_batch(
             excel_file_path,
-            workflow_graph,
-            variables,
+            workflows,
             str(output_folder),
             selected_column_index=selected_column_index,
+            excel_hash=excel_hash,
+            cancel_event=cancel_events.get(session_id),
+            on_file=session_file_publisher(session_id, output_folder, archive),
+            stats=stats,
         )
+        generated_files, project_folder, file_details, workflows_summary = merge_grouped_results(batch_results)
+        complete_workflow_session(
+            session_id, output_folder, generated_files, project_folder, file_details,
+            "workflows", workflows_summary, archive, stats,
+        )
+        logger.info(f"Batch processing completed for session {session_id}")
         
-        # Create ZIP file
-        zip_path = OUTPUT_DIR / f"{session_id}_chain_files.zip"
-        if generated_files:
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file_path in generated_files:
-                    if os.path.exists(file_path):
-                        zipf.write(file_path, os.path.basename(file_path))
-        
-        # Update session
-        session["status"] = "completed"
-        session["results"] = {
-            "files": [os.path.basename(f) for f in generated_files],
-            "file_details": file_details,
-            "zip_path": str(zip_path),
-            "summary": {
-                "total_files": len(generated_files),
-                "project_folder": project_folder or "",
-            },
-        }
-        logger.info(f"Workflow processing completed for session {session_id}")
-        
+    except WorkflowCancelled as e:
+        cancel_workflow_session(session_id, output_folder, e.completed, archive, stats)
     except Exception as e:
+        if archive is not None:
+            archive.abort()
         if session_id in workflow_sessions:
             workflow_sessions[session_id]["status"] = "error"
             workflow_sessions[session_id]["error"] = str(e)
-        logger.error(f"Error in workflow background processing: {e}", exc_info=True)
+        logger.error(f"Error in batch background processing: {e}", exc_info=True)
+    finally:
+        cancel_events.pop(session_id, None)
 
 
 @app.get("/api/workflow/status/{session_id}")
@@ -293,17 +1069,78 @@ async def get_workflow_status(session_id: str):
     }
     
     if session["status"] == "completed":
-        result["results"] = session["results"]
+        # The file list can be very long; page through it with /api/workflow/results
+        result["results"] = {
+            k: v for k, v in session["results"].items() if k not in ("files", "file_details")
+        }
     elif session["status"] == "error":
         result["error"] = session.get("error", "Unknown error")
+    elif session["status"] == "cancelled":
+        result["models_completed"] = session.get("models_completed", 0)
+        if "summary" in session:
+            result["summary"] = session["summary"]
+    else:
+        result["files_completed"] = len(session.get("published_files", []))
     
     return result
 
 
+@app.post("/api/workflow/cancel/{session_id}")
+async def cancel_workflow(session_id: str):
+    """
+    Cancel a running workflow job
+    
+    The job stops before its next model, its partial output is deleted and the
+    session status becomes "cancelled" with the number of models completed.
+    """
+    if session_id not in workflow_sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    session = workflow_sessions[session_id]
+    with session_status_lock:
+        cancel_event = cancel_events.get(session_id)
+        if session["status"] not in ("processing", "cancelling") or cancel_event is None:
+            raise HTTPException(status_code=409, detail=f"Workflow is not running (status: {session['status']})")
+        
+        cancel_event.set()
+        session["status"] = "cancelling"
+    run_index.forget(session_id)
+    
+    return {"session_id": session_id, "status": "cancelling"}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def archive_file_response(request: Request, path: str, sha256: Optional[str], filename: str) -> Response:
+    """
+    Serve a result archive with a strong ETag (its SHA-256)
+    
+    Clients can resume an interrupted download with Range + If-Range and skip
+    an unchanged one with If-None-Match.
+    """
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if sha256:
+        etag = f'"{sha256}"'
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
+    
+    # FileResponse answers Range requests, honouring If-Range against the ETag (starlette>=0.39)
+    return FileResponse(path, headers=headers)
+
+
 @app.get("/api/workflow/download/{session_id}")
-async def download_workflow_results(session_id: str):
+async def download_workflow_results(session_id: str, request: Request):
     """
     Download workflow results
+    
+    Supports Range, If-Range and If-None-Match (see archive_file_response).
     """
     if session_id not in workflow_sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -315,15 +1152,337 @@ async def download_workflow_results(session_id: str):
     
     zip_path = session["results"]["zip_path"]
     
+    if zip_path is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Results are split into parts, download them from /api/workflow/parts/{session_id}",
+        )
+    if not Path(zip_path).exists():
+        raise HTTPException(status_code=404, detail="Download file not found")
+    
+    return archive_file_response(
+        request, zip_path, session["results"].get("zip_sha256"), f"workflow_chain_files_{session_id}.zip"
+    )
+
+
+@app.get("/api/workflow/parts/{session_id}")
+async def list_result_parts(session_id: str):
+    """
+    List the finished ZIP parts of a run split with max_part_mb
+    
+    Parts are listed as soon as they are written, while the job is still running.
+    """
+    if session_id not in workflow_sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    session = workflow_sessions[session_id]
+    if not session.get("max_part_bytes"):
+        raise HTTPException(status_code=400, detail="Results are not split into parts")
+    if session["status"] in ("cancelling", "cancelled"):
+        raise HTTPException(status_code=410, detail="Workflow was cancelled")
+    
+    archive_parts = session.get("archive_parts", [])
+    return {
+        "status": session["status"],
+        "complete": session["status"] == "completed",
+        "parts": [part_summary(part) for part in archive_parts[:len(archive_parts)]],
+    }
+
+
+@app.get("/api/workflow/parts/{session_id}/{part_name}")
+async def download_result_part(session_id: str, part_name: str, request: Request):
+    """
+    Download one ZIP part, or the manifest.json (available once the run is completed)
+    """
+    if session_id not in workflow_sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    session = workflow_sessions[session_id]
+    if session["status"] in ("cancelling", "cancelled"):
+        raise HTTPException(status_code=410, detail="Workflow was cancelled")
+    
+    if part_name == MANIFEST_NAME:
+        if session["status"] != "completed" or not session["results"].get("manifest_path"):
+            raise HTTPException(status_code=400, detail="Processing not completed")
+        return FileResponse(session["results"]["manifest_path"], media_type="application/json")
+    
+    part = next((p for p in session.get("archive_parts", []) if p["name"] == part_name), None)
+    if part is None or not Path(part["path"]).exists():
+        raise HTTPException(status_code=404, detail="Part not found")
+    
+    return archive_file_response(request, part["path"], part["sha256"], f"{session_id}_{part_name}")
+
+
+def completed_session(session_id: str) -> Dict:
+    """Return a completed workflow session or raise the matching HTTP error"""
+    if session_id not in workflow_sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    session = workflow_sessions[session_id]
+    if session["status"] != "completed":
+        raise HTTPException(status_code=400, detail="Processing not completed")
+    return session
+
+
+@app.get("/api/workflow/results/{session_id}")
+async def list_workflow_results(session_id: str, offset: int = 0, limit: int = 100):
+    """
+    Page through the generated files of a completed workflow
+    """
+    file_details = completed_session(session_id)["results"]["file_details"]
+    offset = max(offset, 0)
+    limit = max(limit, 0)
+    return {
+        "total": len(file_details),
+        "offset": offset,
+        "limit": limit,
+        "files": file_details[offset:offset + limit],
+    }
+
+
+@app.get("/api/workflow/results/{session_id}/files/{name:path}")
+async def download_workflow_result_file(session_id: str, name: str):
+    """
+    Download a single chain file from a completed workflow's ZIP
+    
+    name is the file's path in the ZIP (e.g. "Sheet1/MODEL-01.chain") or a
+    model name. The entry is read straight from the archive using the index
+    built when the ZIP was written.
+    """
+    session = completed_session(session_id)
+    archive_index = session.get("archive_index", {})
+    
+    if name in archive_index:
+        archive_name = name
+    elif f"{name}.chain" in archive_index:
+        archive_name = f"{name}.chain"
+    else:
+        matches = session.get("model_index", {}).get(name, [])
+        if not matches:
+            raise HTTPException(status_code=404, detail=f"No result for {name}")
+        if len(matches) > 1:
+            raise HTTPException(
+                status_code=409,
+                detail={"message": f"Several results for {name}, use the full path", "matches": matches},
+            )
+        archive_name = matches[0]
+    
+    zip_path, entry = archive_index[archive_name]
     if not Path(zip_path).exists():
         raise HTTPException(status_code=404, detail="Download file not found")
     
-    return FileResponse(
-        zip_path,
-        headers={"Content-Disposition": f"attachment; filename=workflow_chain_files_{session_id}.zip"}
+    return StreamingResponse(
+        iter_zip_entry(zip_path, archive_name, entry),
+        media_type="application/xml",
+        headers={
+            "Content-Disposition": f"attachment; filename*=utf-8''{quote(os.path.basename(archive_name))}",
+            "Content-Length": str(entry[2]),
+        },
+    )
+
+
+def published_files(session_id: str) -> List[str]:
+    """Return a snapshot of the chain files a session has published so far"""
+    if session_id not in workflow_sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    session = workflow_sessions[session_id]
+    if session["status"] in ("cancelling", "cancelled"):
+        raise HTTPException(status_code=410, detail="Workflow was cancelled")
+    
+    # The job only ever appends, so a slice is a consistent snapshot
+    published = session.get("published_files", [])
+    return published[:len(published)]
+
+
+@app.get("/api/workflow/partial/{session_id}")
+async def list_partial_results(session_id: str, offset: int = 0, limit: int = 1000):
+    """
+    List the chain files completed so far (available while the job is running)
+    """
+    files = published_files(session_id)
+    return {
+        "status": workflow_sessions[session_id]["status"],
+        "files_completed": len(files),
+        "offset": offset,
+        "files": files[max(offset, 0):max(offset, 0) + max(limit, 0)],
+    }
+
+
+@app.get("/api/workflow/partial/{session_id}/download")
+async def download_partial_results(session_id: str):
+    """
+    Download the chain files completed so far as a ZIP streamed on the fly
+    """
+    files = published_files(session_id)
+    output_folder = OUTPUT_DIR / session_id
+    entries = ((output_folder / archive_name, archive_name) for archive_name in files)
+    
+    return StreamingResponse(
+        iter_zip_stream(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=partial_chain_files_{session_id}.zip"},
     )
 
 
+@app.get("/api/workflow/partial/{session_id}/files/{archive_name:path}")
+async def download_partial_file(session_id: str, archive_name: str):
+    """
+    Download a single completed chain file by its name in the results
+    """
+    if archive_name not in published_files(session_id):
+        raise HTTPException(status_code=404, detail="File not completed yet")
+    
+    file_path = OUTPUT_DIR / session_id / archive_name
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return FileResponse(file_path, filename=os.path.basename(archive_name))
+
+
+def require_admin(request: Request) -> None:
+    """Check the X-Admin-Token header (or a Bearer token) against ADMIN_TOKEN"""
+    token = request.headers.get("x-admin-token", "")
+    authorization = request.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[len("bearer "):].strip()
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.post("/api/admin/profile")
+async def profile_workflow(
+    request: Request,
+    session_id: Optional[str] = Form(None),
+    excel_file: Optional[UploadFile] = File(None),
+    workflow_graph: Optional[UploadFile] = File(None),
+    variables: Optional[UploadFile] = File(None),
+    workflows: Optional[UploadFile] = File(None),
+    selected_column_index: str = Form("0"),
+    excel_file_hash: Optional[str] = Form(None),
+    excel_file_name: Optional[str] = Form(None),
+    all_sheets: str = Form("false"),
+    compression: str = Form("deflate"),
+    compression_level: Optional[str] = Form(None),
+    memory: str = Form("false"),
+    top: str = Form("30"),
+):
+    """
+    Profile a workflow job under cProfile (admin only)
+    
+    Either replays the inputs of an existing session (session_id) or runs the
+    given inputs, which take the same fields as /api/workflow/run (or
+    /api/workflow/batch with workflows). The job runs in one thread, sheets
+    and graphs one after another, and its output is discarded. With
+    memory=true allocations are traced with tracemalloc too, which makes the
+    run several times slower. One profile runs at a time; other profile
+    requests get 409 meanwhile.
+    
+    Returns the top functions by cumulative and own time, the top allocation
+    sites when tracing memory, the stage/node timings of the run and a
+    download_url for the raw stats (open with pstats or snakeviz).
+    """
+    require_admin(request)
+    try:
+        limit = max(1, int(top))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="top must be an integer")
+    
+    profile_id = str(uuid.uuid4())
+    try:
+        with profiling_slot():
+            if session_id:
+                if session_id not in workflow_sessions:
+                    raise HTTPException(status_code=404, detail="Session not found")
+                session = workflow_sessions[session_id]
+                excel_hash = session["excel_hash"]
+                excel_name = os.path.basename(session["excel_file"])[len(session_id) + 1:]
+                job_workflows = session.get("workflows") or [
+                    {"workflow_graph": session["workflow_graph"], "variables": session["variables"]}
+                ]
+                column_index = session.get("selected_column_index", 0)
+                run_all_sheets = session.get("all_sheets", False)
+                compression, level = session["compression"], session["compression_level"]
+            else:
+                excel_name = model_list_name(excel_file, excel_file_name, excel_file_hash)
+                if workflows is not None:
+                    job_workflows, _ = await read_workflows(workflows)
+                elif workflow_graph is not None and variables is not None:
+                    job_workflows = [{
+                        "workflow_graph": json.loads((await workflow_graph.read()).decode('utf-8')),
+                        "variables": json.loads((await variables.read()).decode('utf-8')),
+                    }]
+                else:
+                    raise HTTPException(status_code=400, detail="Give a session_id, workflows or workflow_graph and variables")
+                column_index = parse_column_index(selected_column_index)
+                run_all_sheets = is_truthy(all_sheets)
+                if run_all_sheets and (len(job_workflows) > 1 or not excel_name.lower().endswith('.xlsx')):
+                    raise HTTPException(status_code=400, detail="Multi-sheet runs require one graph and an .xlsx workbook")
+                compression, level = parse_compression(compression, compression_level)
+                excel_hash, _ = await receive_upload(excel_name, excel_file, excel_file_hash)
+        
+            excel_path = link_session_file(f"profile-{profile_id}", excel_name, excel_hash)
+            PROFILE_DIR.mkdir(exist_ok=True)
+            stats_path = PROFILE_DIR / f"{profile_id}.prof"
+            # Time the nodes of every model; profiling is slow anyway
+            run_stats = RunStats(sample_every=1, first=0)
+        
+            def run() -> Dict:
+                with tempfile.TemporaryDirectory(prefix="pychain-profile-") as output_folder:
+                    summary = profile_call(
+                        lambda: replay_job(
+                            str(excel_path),
+                            job_workflows,
+                            output_folder,
+                            column_index,
+                            excel_hash,
+                            all_sheets=run_all_sheets,
+                            compression=compression,
+                            compression_level=level,
+                            stats=run_stats,
+                        ),
+                        stats_path,
+                        trace_memory=is_truthy(memory),
+                        limit=limit,
+                    )
+                summary["models"] = summary.pop("result")
+                return summary
+        
+            try:
+                summary = await asyncio.to_thread(run)
+            finally:
+                excel_path.unlink(missing_ok=True)
+            summary.update(run_stats.summary())
+            keep_profile(profile_id, stats_path)
+        
+            return {
+                "profile_id": profile_id,
+                "session_id": session_id,
+                "summary": summary,
+                "download_url": f"/api/admin/profile/{profile_id}/download",
+            }
+    
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error profiling workflow: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/admin/profile/{profile_id}/download")
+async def download_profile(profile_id: str, request: Request):
+    """Download the raw cProfile stats of a profiling run (admin only)"""
+    require_admin(request)
+    stats_path = profiles.get(profile_id)
+    if stats_path is None or not stats_path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(stats_path, media_type="application/octet-stream", filename=f"pychain_{profile_id}.prof")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,158 @@
+"""
+Blob Store - Content-addressed storage for uploaded files
+
+Uploads are stored once under their SHA-256 digest and linked into each
+session that uses them, so identical files are never written twice. The store
+is kept under a size limit by evicting the least recently used blobs.
+"""
+
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+from utils.file_upload import save_upload_file
+from utils.lru_files import evict_least_recent, touch
+
+_DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def is_valid_digest(digest: str) -> bool:
+    """Check that a string is a lowercase SHA-256 hex digest"""
+    return isinstance(digest, str) and bool(_DIGEST_PATTERN.match(digest))
+
+
+class BlobStore:
+    """
+    Content-addressed file store keyed by SHA-256 digest
+
+    Blobs live at ``<root>/<digest[:2]>/<digest>``. Uploads are streamed to a
+    temporary file first and moved into place once the digest is known.
+
+    With max_bytes, storing a new blob evicts the least recently used ones
+    (by the time they were last stored or linked into a session) until the
+    store fits. Blobs still hard-linked into a session folder are in use and
+    never evicted, so the store can stay over the limit while they are.
+    Blobs used within the last min_age seconds are never evicted either: a
+    request stores or touches its blob and links it into the session right
+    after, and another request (or worker process) evicting in between would
+    make that link fail.
+    """
+
+    def __init__(self, root: Union[str, Path], max_bytes: Optional[int] = None, min_age: float = 60.0):
+        self.root = Path(root)
+        self.max_bytes = max_bytes or None
+        self.min_age = min_age
+        self.tmp_dir = self.root / 'tmp'
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(exist_ok=True)
+
+    def blob_path(self, digest: str) -> Path:
+        """Return the on-disk location for a digest (the blob may not exist)"""
+        if not is_valid_digest(digest):
+            raise ValueError(f"Invalid SHA-256 digest: {digest}")
+        return self.root / digest[:2] / digest
+
+    def exists(self, digest: str) -> bool:
+        """Check whether a blob with this digest is stored"""
+        return is_valid_digest(digest) and self.blob_path(digest).is_file()
+
+    def size(self, digest: str) -> Optional[int]:
+        """Return the stored size of a blob, or None if it is unknown"""
+        if not self.exists(digest):
+            return None
+        return self.blob_path(digest).stat().st_size
+
+    async def save_upload(self, upload, max_bytes: Optional[int] = None) -> Tuple[str, int, bool]:
+        """
+        Stream an upload into the store
+
+        Args:
+            upload: FastAPI UploadFile
+            max_bytes: Maximum number of bytes allowed for this file
+
+        Returns:
+            Tuple of (digest, bytes received, whether the blob already existed)
+        """
+        tmp_path = self.tmp_dir / f"{uuid.uuid4().hex}.part"
+        size, digest = await save_upload_file(upload, tmp_path, max_bytes)
+
+        target = self.blob_path(digest)
+        if target.exists():
+            tmp_path.unlink()
+            self.touch(digest)
+            return digest, size, True
+
+        target.parent.mkdir(exist_ok=True)
+        os.replace(tmp_path, target)
+        self.evict(protect=[digest])
+        return digest, size, False
+
+    def touch(self, digest: str) -> None:
+        """Mark a blob as just used (its modification time orders eviction)"""
+        touch(self.blob_path(digest))
+
+    def evict(self, protect: Iterable[str] = ()) -> List[str]:
+        """
+        Delete least recently used blobs until the store is within max_bytes
+
+        Args:
+            protect: Digests that must be kept (e.g. the blob just stored)
+
+        Returns:
+            Digests of the deleted blobs
+        """
+        if not self.max_bytes:
+            return []
+        protected = set(protect)
+        used_before = time.time() - self.min_age
+        candidates = []
+        total = 0
+        for folder in self.root.iterdir():
+            if folder == self.tmp_dir or not folder.is_dir():
+                continue
+            for entry in os.scandir(folder):
+                if not entry.is_file() or not is_valid_digest(entry.name):
+                    continue
+                stat = entry.stat()
+                total += stat.st_size
+                # A link count above 1 means a session file still shares the blob
+                if entry.name not in protected and stat.st_nlink <= 1 and stat.st_mtime < used_before:
+                    candidates.append((stat.st_mtime, stat.st_size, entry.path))
+
+        evicted = evict_least_recent(candidates, total, self.max_bytes)
+        return [os.path.basename(path) for path in evicted]
+
+    def link_to(self, digest: str, destination: Union[str, Path]) -> Path:
+        """
+        Make a stored blob available at a session path
+
+        A hard link is used where the filesystem allows it, otherwise the blob
+        is copied.
+
+        Args:
+            digest: SHA-256 digest of a stored blob
+            destination: Path the session expects the file at
+
+        Returns:
+            The destination path
+
+        Raises:
+            FileNotFoundError: If the blob is not (or no longer) stored
+        """
+        source = self.blob_path(digest)
+        if not source.is_file():
+            raise FileNotFoundError(f"No stored file with hash {digest}")
+
+        destination = Path(destination)
+        if destination.exists():
+            destination.unlink()
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+        self.touch(digest)
+        return destination
@@ -0,0 +1,229 @@
+"""
+Profiler - Runs a workflow job under cProfile (and optionally tracemalloc)
+and summarises where the time and memory went
+"""
+
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from services.result_archive import ResultArchiveWriter, resolve_compression
+from services.run_stats import RunStats
+from services.workflow_runner import (
+    load_model_list,
+    make_output_folders,
+    run_workbook,
+    run_workflow,
+    uses_row_columns,
+    workflow_names,
+)
+
+# Stack frames kept per allocation when tracing memory (1 = the allocating line)
+TRACEMALLOC_FRAMES = 1
+
+# tracemalloc (and the interpreter's profiling hook) is process-global, so
+# only one profile may run at a time
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another one is running"""
+
+
+@contextmanager
+def profiling_slot() -> Iterator[None]:
+    """
+    Hold the process-wide profiling slot for the block
+
+    Raises:
+        ProfilerBusyError: If another profile holds it
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("Another profile is running")
+    try:
+        yield
+    finally:
+        _profile_lock.release()
+
+
+def replay_job(
+    excel_file_path: str,
+    workflows: List[Dict[str, Any]],
+    output_folder: str,
+    selected_column_index: int = 0,
+    excel_hash: Optional[str] = None,
+    all_sheets: bool = False,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    stats: Optional[RunStats] = None,
+) -> int:
+    """
+    Generate and zip the chain files of a job, entirely in the calling thread
+
+    cProfile only sees the thread it runs in, so batch graphs are run one
+    after another (instead of on a thread pool as in a real job) and the ZIP
+    is compressed inline. Sheets run one after another in a real job too.
+
+    Args:
+        excel_file_path: Path to the model list
+        workflows: One {"name", "workflow_graph", "variables"} entry, or several for a batch
+        output_folder: Scratch folder for the chain files and ZIP
+        selected_column_index: Which column to read model names from (0-based)
+        excel_hash: SHA-256 of the model list file if already known
+        all_sheets: Run the (single) graph for every sheet of the workbook
+        compression: Compression name accepted by resolve_compression
+        compression_level: Compression level
+        stats: Records stage and node timings when given
+
+    Returns:
+        Number of chain files generated
+    """
+    runs = []
+    generated_files = []
+    if all_sheets:
+        results = run_workbook(
+            excel_file_path,
+            workflows[0].get('workflow_graph') or {},
+            workflows[0].get('variables') or [],
+            output_folder,
+            selected_column_index,
+            excel_hash,
+            stats=stats,
+        )
+        for files, _, _ in results.values():
+            generated_files.extend(files)
+    elif len(workflows) == 1:
+        runs.append((workflows[0], output_folder, {}))
+    else:
+        names = workflow_names(workflows)
+        folders = make_output_folders(names, output_folder)
+        needs_columns = any(
+            uses_row_columns(w.get('workflow_graph') or {}, w.get('variables') or []) for w in workflows
+        )
+        model_list = load_model_list(excel_file_path, selected_column_index, excel_hash, with_row_columns=needs_columns)
+        for name, workflow in zip(names, workflows):
+            group_stats = stats.for_group(name) if stats is not None else None
+            runs.append((workflow, folders[name], {'model_list': model_list, 'stats': group_stats}))
+
+    for workflow, folder, options in runs:
+        options.setdefault('stats', stats)
+        files, _, _ = run_workflow(
+            excel_file_path,
+            workflow.get('workflow_graph') or {},
+            workflow.get('variables') or [],
+            folder,
+            selected_column_index,
+            excel_hash,
+            **options,
+        )
+        generated_files.extend(files)
+
+    method, level = resolve_compression(compression, compression_level)
+    archive = ResultArchiveWriter(
+        Path(output_folder) / 'profile.zip', compression=method, compresslevel=level, max_workers=1,
+    )
+    start = time.perf_counter()
+    for file_path in generated_files:
+        archive.add(file_path, os.path.relpath(file_path, output_folder))
+    archive.close()
+    if stats is not None:
+        stats.add_stage('zip', time.perf_counter() - start)
+    return len(generated_files)
+
+
+def _function_name(func: tuple) -> str:
+    filename, line, name = func
+    if filename == '~':
+        # Built-in functions have no file
+        return name
+    return f"{filename}:{line}({name})"
+
+
+def top_functions(stats: pstats.Stats, sort: str, limit: int) -> List[Dict[str, Any]]:
+    """The limit most expensive functions by 'cumulative' or 'tottime'"""
+    index = 3 if sort == 'cumulative' else 2
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+    return [
+        {
+            'function': _function_name(func),
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'total_seconds': round(total, 6),
+            'cumulative_seconds': round(cumulative, 6),
+        }
+        for func, (primitive_calls, calls, total, cumulative, _) in rows
+    ]
+
+
+def profile_call(
+    func: Callable[[], Any],
+    stats_path: Path,
+    trace_memory: bool = False,
+    limit: int = 30,
+) -> Dict[str, Any]:
+    """
+    Run func under cProfile, write the raw stats and summarise them
+
+    Callers must hold profiling_slot(). tracemalloc still sees allocations
+    made by other threads (e.g. jobs running at the same time), so the
+    allocation sites are only clean on an otherwise idle server.
+
+    Args:
+        func: Zero-argument callable to profile
+        stats_path: Where to write the cProfile stats (readable with pstats or snakeviz)
+        trace_memory: Also trace allocations with tracemalloc (much slower)
+        limit: Number of functions and allocation sites in the summary
+
+    Returns:
+        Summary with 'wall_seconds', 'result', 'top_cumulative', 'top_tottime'
+        and, when tracing memory, 'memory' ({peak_bytes, top_allocations})
+    """
+    profile = cProfile.Profile()
+    if trace_memory:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    start = time.perf_counter()
+    try:
+        profile.enable()
+        try:
+            result = func()
+        finally:
+            profile.disable()
+        wall_seconds = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot() if trace_memory else None
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    profile.dump_stats(str(stats_path))
+    stats = pstats.Stats(profile)
+    summary = {
+        'wall_seconds': round(wall_seconds, 6),
+        'result': result,
+        'total_calls': stats.total_calls,
+        'top_cumulative': top_functions(stats, 'cumulative', limit),
+        'top_tottime': top_functions(stats, 'tottime', limit),
+    }
+    if snapshot is not None:
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        summary['memory'] = {
+            'peak_bytes': peak,
+            'top_allocations': [
+                {
+                    'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    'size_bytes': stat.size,
+                    'count': stat.count,
+                }
+                for stat in snapshot.statistics('lineno')[:limit]
+            ],
+        }
+    return summary
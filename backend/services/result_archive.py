@@ -0,0 +1,339 @@
+"""
+Result Archive - Writes generated chain files into one ZIP, or into
+size-bounded ZIP parts with a manifest
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from utils.zip_stream import ZipEntry, zip_entry_index
+
+MANIFEST_NAME = 'manifest.json'
+
+# Compression settings accepted per run: name -> (zipfile method, default level)
+COMPRESSION_METHODS = {
+    'stored': (zipfile.ZIP_STORED, None),
+    'deflate': (zipfile.ZIP_DEFLATED, None),
+    'fast': (zipfile.ZIP_DEFLATED, 1),
+    'bzip2': (zipfile.ZIP_BZIP2, None),
+    'lzma': (zipfile.ZIP_LZMA, None),
+}
+
+# Number of threads compressing archive entries (zlib, bz2 and lzma release the GIL)
+ARCHIVE_MAX_WORKERS = int(os.getenv("ARCHIVE_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Chain files are small, so entries are handed to the compression threads in batches
+_BATCH_ENTRIES = 64
+
+# Fixed sizes of the ZIP records written per entry and per archive
+_LOCAL_HEADER_SIZE = 30
+_CENTRAL_DIR_ENTRY_SIZE = 46
+# End of central directory record plus room for the ZIP64 end records
+_END_RECORDS_SIZE = 22 + 56 + 20
+
+
+def part_name(number: int) -> str:
+    """Return the file name of an archive part (part-001.zip, part-002.zip, ...)"""
+    return f"part-{number:03d}.zip"
+
+
+def resolve_compression(name: Optional[str], level: Optional[int] = None) -> Tuple[int, Optional[int]]:
+    """
+    Turn a compression setting into a zipfile method and level
+
+    Args:
+        name: One of COMPRESSION_METHODS (default "deflate")
+        level: Compression level (0-9 for deflate, 1-9 for bzip2; ignored otherwise)
+
+    Returns:
+        Tuple of (zipfile compression constant, level or None for the default)
+
+    Raises:
+        ValueError: If the name or level is not valid
+    """
+    name = (name or 'deflate').strip().lower()
+    if name not in COMPRESSION_METHODS:
+        raise ValueError(f"Unknown compression {name!r}, expected one of {', '.join(COMPRESSION_METHODS)}")
+    compression, default_level = COMPRESSION_METHODS[name]
+    if level is None or compression in (zipfile.ZIP_STORED, zipfile.ZIP_LZMA):
+        return compression, default_level
+    lowest = 0 if compression == zipfile.ZIP_DEFLATED else 1
+    if not lowest <= level <= 9:
+        raise ValueError(f"Compression level for {name} must be between {lowest} and 9")
+    return compression, level
+
+
+def _zip_internals_available() -> bool:
+    """Whether this zipfile has the private parts append_entry needs for precompressed data"""
+    if not (hasattr(zipfile, '_get_compressor') and hasattr(zipfile.ZipInfo, 'FileHeader')):
+        return False
+    with zipfile.ZipFile(io.BytesIO(), 'w') as probe:
+        return all(hasattr(probe, name) for name in ('fp', '_didModify', 'start_dir', 'NameToInfo', 'filelist'))
+
+
+# Entries are compressed outside the ZipFile (on the worker threads) only when
+# zipfile's internals are as expected; otherwise ZipFile.writestr compresses them
+PRECOMPRESSED_ENTRIES = _zip_internals_available()
+
+
+def compress_entry(data: bytes, compression: int = zipfile.ZIP_DEFLATED, compresslevel: Optional[int] = None) -> bytes:
+    """Compress one entry's bytes exactly as zipfile would (needs PRECOMPRESSED_ENTRIES)"""
+    compressor = zipfile._get_compressor(compression, compresslevel)
+    if compressor is None:
+        return data
+    return compressor.compress(data) + compressor.flush()
+
+
+def append_entry(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, data: bytes, precompressed: bool) -> None:
+    """
+    Append an entry to a ZipFile open for writing
+
+    Precompressed data (zinfo with its sizes and CRC set) is written as is,
+    the way ZipFile.write does, so ZipFile.close() writes a normal central
+    directory for it. Otherwise data is the raw file content and
+    ZipFile.writestr compresses it.
+    """
+    if not precompressed:
+        zipf.writestr(zinfo, data, compress_type=zinfo.compress_type, compresslevel=zipf.compresslevel)
+        return
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    zinfo.header_offset = zipf.fp.tell()
+    zipf._didModify = True
+    zipf.fp.write(zinfo.FileHeader(zip64))
+    zipf.fp.write(data)
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+    zipf.start_dir = zipf.fp.tell()
+
+
+class ResultArchiveWriter:
+    """
+    Writes chain files into a result archive
+
+    Without max_part_bytes everything goes into a single ZIP at ``path``.
+    With it, ``path`` is a directory that receives ``part-001.zip``,
+    ``part-002.zip``, ... each kept under max_part_bytes (a single entry
+    larger than the limit gets a part of its own), plus a ``manifest.json``
+    listing the models in each part. Entries are compressed before they are
+    written so the size of every part is known exactly, and on_part is called
+    as soon as a part is finished. Where zipfile's internals differ from what
+    append_entry expects (precompress false), entries are compressed by
+    ZipFile.writestr instead and parts are split on the uncompressed size.
+
+    With more than one worker, entries are compressed on a thread pool in
+    small batches and written in the order add() was called. add() may be
+    called from several threads.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_part_bytes: Optional[int] = None,
+        on_part: Optional[Callable[[Dict], None]] = None,
+        compression: int = zipfile.ZIP_DEFLATED,
+        compresslevel: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        precompress: bool = PRECOMPRESSED_ENTRIES,
+    ):
+        self.path = Path(path)
+        self.precompress = precompress
+        self.max_part_bytes = max_part_bytes or None
+        self.on_part = on_part
+        self.compression = compression
+        self.compresslevel = compresslevel
+        workers = max(1, max_workers or ARCHIVE_MAX_WORKERS)
+        self._executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix='archive') if workers > 1 else None
+        )
+        # Batches being compressed, in add() order, and the batch being filled
+        self._pending: Deque[Future] = deque()
+        self._max_pending = workers * 2
+        self._batch: List[Tuple[str, str]] = []
+        self.parts: List[Dict] = []
+        # Archive name -> (ZIP path, entry) for reading single files back
+        self.entries: Dict[str, Tuple[str, ZipEntry]] = {}
+        self._lock = threading.Lock()
+        self._zipf: Optional[zipfile.ZipFile] = None
+        self._zip_path: Optional[Path] = None
+        self._part_files: List[str] = []
+        self._part_bytes = 0
+        self._central_dir_bytes = 0
+        if self.max_part_bytes:
+            self.path.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def parted(self) -> bool:
+        return self.max_part_bytes is not None
+
+    def add(self, file_path: Union[str, Path], archive_name: str) -> None:
+        """
+        Compress a file and append it to the archive
+
+        Args:
+            file_path: Chain file on disk
+            archive_name: Path of the file inside the archive
+        """
+        if self._executor is None:
+            zinfo, compressed = self._compress(str(file_path), archive_name)
+            with self._lock:
+                self._write(zinfo, compressed)
+            return
+
+        with self._lock:
+            self._batch.append((str(file_path), archive_name))
+            if len(self._batch) >= _BATCH_ENTRIES:
+                self._submit_batch()
+            self._write_ready(len(self._pending) - self._max_pending)
+
+    def _submit_batch(self) -> None:
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self._pending.append(self._executor.submit(self._compress_batch, batch))
+
+    def _compress_batch(self, batch: List[Tuple[str, str]]) -> List[Tuple[zipfile.ZipInfo, bytes]]:
+        return [self._compress(file_path, archive_name) for file_path, archive_name in batch]
+
+    def _compress(self, file_path: str, archive_name: str) -> Tuple[zipfile.ZipInfo, bytes]:
+        zinfo = zipfile.ZipInfo.from_file(file_path, archive_name)
+        zinfo.compress_type = self.compression
+        if self.compression == zipfile.ZIP_LZMA:
+            # Compressed data includes an end-of-stream marker
+            zinfo.flag_bits |= 0x02
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        if not self.precompress:
+            zinfo.file_size = zinfo.compress_size = len(data)
+            return zinfo, data
+        compressed = compress_entry(data, self.compression, self.compresslevel)
+        zinfo.file_size = len(data)
+        zinfo.compress_size = len(compressed)
+        zinfo.CRC = zlib.crc32(data)
+        return zinfo, compressed
+
+    def _write_ready(self, at_least: int = 0) -> None:
+        """Write finished batches from the front of the queue (waiting for at_least of them)"""
+        while self._pending and (at_least > 0 or self._pending[0].done()):
+            for zinfo, compressed in self._pending.popleft().result():
+                self._write(zinfo, compressed)
+            at_least -= 1
+
+    def _write(self, zinfo: zipfile.ZipInfo, compressed: bytes) -> None:
+        name_size = len(zinfo.filename.encode('utf-8'))
+        if self._zipf is not None and self.max_part_bytes:
+            projected = (
+                self._part_bytes
+                + _LOCAL_HEADER_SIZE + name_size + len(zinfo.extra) + len(compressed)
+                + self._central_dir_bytes + _CENTRAL_DIR_ENTRY_SIZE + name_size
+                + _END_RECORDS_SIZE
+            )
+            if projected > self.max_part_bytes:
+                self._finish_part()
+        if self._zipf is None:
+            self._open_part()
+
+        append_entry(self._zipf, zinfo, compressed, self.precompress)
+
+        # Local header, name, extra field (ZIP64 sizes included) and data
+        self._part_bytes += _LOCAL_HEADER_SIZE + name_size + len(zinfo.extra) + zinfo.compress_size
+        self._part_files.append(zinfo.filename)
+        self._central_dir_bytes += _CENTRAL_DIR_ENTRY_SIZE + name_size + len(zinfo.extra)
+
+    def _open_part(self) -> None:
+        if self.parted:
+            self._zip_path = self.path / part_name(len(self.parts) + 1)
+        else:
+            self._zip_path = self.path
+        self._zipf = zipfile.ZipFile(self._zip_path, 'w', self.compression, compresslevel=self.compresslevel)
+        self._part_files = []
+        self._part_bytes = 0
+        self._central_dir_bytes = 0
+
+    def _finish_part(self) -> None:
+        index = zip_entry_index(self._zipf)
+        self._zipf.close()
+        self._zipf = None
+
+        zip_path = str(self._zip_path)
+        for archive_name, entry in index.items():
+            self.entries[archive_name] = (zip_path, entry)
+
+        digest = hashlib.sha256()
+        with open(zip_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+
+        part = {
+            'name': self._zip_path.name,
+            'path': zip_path,
+            'size': os.path.getsize(zip_path),
+            'sha256': digest.hexdigest(),
+            'files': list(self._part_files),
+        }
+        self.parts.append(part)
+        if self.on_part is not None:
+            self.on_part(part)
+
+    def close(self) -> List[Dict]:
+        """
+        Finish the last part and, for parted archives, write the manifest
+
+        Returns:
+            List of parts ({name, path, size, sha256, files}); empty if nothing was added
+        """
+        with self._lock:
+            if self._executor is not None:
+                try:
+                    self._submit_batch()
+                    self._write_ready(len(self._pending))
+                finally:
+                    self._executor.shutdown()
+            if self._zipf is not None:
+                self._finish_part()
+            if self.parted:
+                manifest = {
+                    'parts': [
+                        {
+                            'name': part['name'],
+                            'size': part['size'],
+                            'sha256': part['sha256'],
+                            'files': part['files'],
+                            'models': [os.path.splitext(os.path.basename(f))[0] for f in part['files']],
+                        }
+                        for part in self.parts
+                    ],
+                }
+                with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, indent=2)
+            return self.parts
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.path / MANIFEST_NAME
+
+    def abort(self) -> None:
+        """Discard everything written so far"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+        with self._lock:
+            self._pending.clear()
+            self._batch = []
+            if self._zipf is not None:
+                self._zipf.close()
+                self._zipf = None
+            if self.parted:
+                shutil.rmtree(self.path, ignore_errors=True)
+            else:
+                try:
+                    self.path.unlink()
+                except OSError:
+                    pass
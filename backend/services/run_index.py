@@ -0,0 +1,134 @@
+"""
+Run Index - Canonical request hashing so identical workflow runs are only done once
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+# Fields the editor stores on graphs, nodes and edges that never affect the
+# generated chain files
+UI_GRAPH_FIELDS = {'id', 'name', 'createdAt', 'updatedAt', 'viewport'}
+UI_NODE_FIELDS = {
+    'position', 'positionAbsolute', 'measured', 'width', 'height',
+    'selected', 'dragging', 'resizing', 'style', 'className', 'zIndex',
+}
+UI_EDGE_FIELDS = {
+    'id', 'type', 'selected', 'animated', 'style', 'className',
+    'markerStart', 'markerEnd', 'zIndex', 'label',
+}
+
+
+def canonical_graph(workflow_graph: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Strip UI-only fields from a workflow graph
+
+    Node and edge order is kept because it decides execution order.
+
+    Args:
+        workflow_graph: Workflow graph JSON (nodes and edges)
+
+    Returns:
+        New dict containing only the fields that affect generation
+    """
+    graph = {k: v for k, v in workflow_graph.items() if k not in UI_GRAPH_FIELDS}
+    graph['nodes'] = [
+        {k: v for k, v in node.items() if k not in UI_NODE_FIELDS}
+        for node in workflow_graph.get('nodes', [])
+    ]
+    graph['edges'] = [
+        {k: v for k, v in edge.items() if k not in UI_EDGE_FIELDS}
+        for edge in workflow_graph.get('edges', [])
+    ]
+    return graph
+
+
+def canonical_json(value: Any) -> str:
+    """Serialize a value to JSON with sorted keys and no insignificant whitespace"""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def run_key(
+    excel_hash: str,
+    workflows: List[Dict[str, Any]],
+    selected_column_index: int = 0,
+    **options: Any,
+) -> str:
+    """
+    Compute the idempotency key of a run request
+
+    Args:
+        excel_hash: SHA-256 of the model list file
+        workflows: List of {"name", "workflow_graph", "variables"} entries
+            (a single-graph run is a list of one)
+        selected_column_index: Which column model names are read from
+        **options: Any other request options that change the output (e.g. all_sheets)
+
+    Returns:
+        SHA-256 hex digest of the canonical request
+    """
+    request = {
+        'excel_hash': excel_hash,
+        'selected_column_index': selected_column_index,
+        'workflows': [
+            {
+                'name': workflow.get('name'),
+                'workflow_graph': canonical_graph(workflow.get('workflow_graph') or {}),
+                'variables': workflow.get('variables') or [],
+            }
+            for workflow in workflows
+        ],
+        'options': options,
+    }
+    return hashlib.sha256(canonical_json(request).encode('utf-8')).hexdigest()
+
+
+class RunIndex:
+    """
+    Maps run keys to the session that produced (or is producing) the result
+    """
+
+    # Session states whose result can be handed back for an identical request
+    REUSABLE_STATUSES = ('processing', 'completed')
+
+    def __init__(self):
+        self._sessions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def claim(
+        self,
+        key: str,
+        session_id: str,
+        sessions: Dict[str, Dict[str, Any]],
+        force: bool = False,
+    ) -> Optional[str]:
+        """
+        Claim a key for a new session unless a reusable session already has it
+
+        Sessions that failed, were cancelled or no longer exist do not count
+        and are replaced.
+
+        Args:
+            key: Run key from run_key()
+            session_id: Session that will do the work if the key is free
+            sessions: Session store to check existing entries against
+            force: Always give the key to session_id (re-run on purpose)
+
+        Returns:
+            The existing session id to reuse, or None if session_id now owns the key
+        """
+        with self._lock:
+            existing_id = self._sessions.get(key)
+            if existing_id is not None and not force:
+                existing = sessions.get(existing_id)
+                if existing is not None and existing.get('status') in self.REUSABLE_STATUSES:
+                    return existing_id
+            self._sessions[key] = session_id
+            return None
+
+    def forget(self, session_id: str) -> None:
+        """Drop every key pointing at a session"""
+        with self._lock:
+            for key in [k for k, v in self._sessions.items() if v == session_id]:
+                del self._sessions[key]
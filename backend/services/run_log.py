@@ -0,0 +1,106 @@
+"""
+Run Log - Structured, level-gated and sampled logging for the workflow runner
+
+Per-model events are logged at DEBUG, and only a sample of them: the first
+RUN_LOG_FIRST occurrences of each event in a run, then every
+RUN_LOG_SAMPLE_EVERY-th. Occurrences are counted per run (see RunLogger.run).
+Nothing is formatted unless a record is actually emitted, so with DEBUG off
+a per-model event costs one level check. Run-level summaries go to INFO.
+
+Records carry the event name and its fields as ``record.event`` and
+``record.fields`` for structured handlers; the message reads
+"event key=value ...".
+"""
+
+import itertools
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+# Occurrences of each per-model event logged before sampling starts
+RUN_LOG_FIRST = int(os.getenv("RUN_LOG_FIRST", "5"))
+# After that, one in this many occurrences is logged
+RUN_LOG_SAMPLE_EVERY = max(1, int(os.getenv("RUN_LOG_SAMPLE_EVERY", "1000")))
+
+
+class _Fields:
+    """key=value rendering of event fields, done only when the record is formatted"""
+
+    __slots__ = ('fields',)
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return ' '.join(f"{key}={value!r}" for key, value in self.fields.items())
+
+
+class _Names:
+    """Names of variables (dicts with a 'name') or keys of a dict, listed only when formatted"""
+
+    __slots__ = ('items',)
+
+    def __init__(self, items: Iterable[Any]):
+        self.items = items
+
+    def __repr__(self) -> str:
+        return repr([item.get('name') if isinstance(item, dict) else item for item in self.items])
+
+
+def names_of(items: Iterable[Any]) -> _Names:
+    """Log field listing the names of variables instead of their full bindings"""
+    return _Names(items)
+
+
+class RunLogger:
+    """Wraps a logging.Logger with model-level (sampled DEBUG) and run-level (INFO) events"""
+
+    def __init__(self, logger: logging.Logger, first: int = RUN_LOG_FIRST, sample_every: int = RUN_LOG_SAMPLE_EVERY):
+        self.logger = logger
+        self.first = first
+        self.sample_every = sample_every
+        # Event -> occurrence counter of the current run (set by run())
+        self._run_counters: ContextVar[Optional[Dict[str, Iterator[int]]]] = ContextVar(
+            f"run_log_counters_{id(self)}", default=None
+        )
+        # Counters for events outside a run (next() on itertools.count is atomic, so no lock)
+        self._counters: Dict[str, Iterator[int]] = {}
+
+    @contextmanager
+    def run(self) -> Iterator[None]:
+        """Count the events logged in the block (one run, in one thread) from zero"""
+        token = self._run_counters.set({})
+        try:
+            yield
+        finally:
+            self._run_counters.reset(token)
+
+    def _sampled(self, event: str) -> bool:
+        counters = self._run_counters.get()
+        if counters is None:
+            counters = self._counters
+        counter = counters.get(event)
+        if counter is None:
+            counter = counters.setdefault(event, itertools.count())
+        occurrence = next(counter)
+        return occurrence < self.first or (occurrence - self.first) % self.sample_every == self.sample_every - 1
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any]) -> None:
+        self.logger.log(level, '%s %s', event, _Fields(fields), extra={'event': event, 'fields': fields})
+
+    def model_event(self, event: str, **fields: Any) -> None:
+        """Log a per-model event at DEBUG, sampled; pass values as they are, they are formatted lazily"""
+        if self.logger.isEnabledFor(logging.DEBUG) and self._sampled(event):
+            self._log(logging.DEBUG, event, fields)
+
+    def summary(self, event: str, **fields: Any) -> None:
+        """Log a run-level event at INFO"""
+        if self.logger.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields: Any) -> None:
+        """Log a problem with the run at WARNING"""
+        if self.logger.isEnabledFor(logging.WARNING):
+            self._log(logging.WARNING, event, fields)
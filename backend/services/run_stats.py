@@ -0,0 +1,213 @@
+"""
+Run Stats - Per-node and per-stage timings and output sizes of a workflow run
+"""
+
+import copy
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+from services.tracing import SessionTrace
+
+# Durations kept per node for the p95 (a uniform sample once a node has run more often)
+SAMPLE_SIZE = 1000
+
+# Nodes are timed for every model up to NODE_TIMING_FIRST, then for one model
+# in NODE_TIMING_SAMPLE_EVERY (timing every node of every model costs ~15-20%).
+# Executions are counted for every model; time and bytes are scaled up from
+# the timed ones.
+NODE_TIMING_FIRST = int(os.getenv("NODE_TIMING_FIRST", "20"))
+NODE_TIMING_SAMPLE_EVERY = max(1, int(os.getenv("NODE_TIMING_SAMPLE_EVERY", "20")))
+
+
+class _Timing:
+    """Timed call count, total time, sampled durations and bytes of one node or node type"""
+
+    __slots__ = ('count', 'total', 'bytes', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.bytes = 0
+        self.samples: List[float] = []
+
+    def add(self, seconds: float, size: int, rng: random.Random) -> None:
+        self.count += 1
+        self.total += seconds
+        self.bytes += size
+        # Reservoir sampling keeps the p95 meaningful without keeping every duration
+        if len(self.samples) < SAMPLE_SIZE:
+            self.samples.append(seconds)
+        else:
+            slot = rng.randrange(self.count)
+            if slot < SAMPLE_SIZE:
+                self.samples[slot] = seconds
+
+    def summary(self, untimed: int = 0) -> Dict[str, Any]:
+        """Summary over every execution, untimed ones estimated from the timed ones"""
+        samples = sorted(self.samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else 0.0
+        count = self.count + untimed
+        scale = count / self.count if self.count else 0.0
+        return {
+            'count': count,
+            'timed_count': self.count,
+            'total_seconds': round(self.total * scale, 6),
+            'p95_seconds': round(p95, 6),
+            'bytes': round(self.bytes * scale),
+            'estimated': untimed > 0,
+        }
+
+
+class RunStats:
+    """
+    Collects timings for one job
+
+    Nodes are recorded per instance (node id) and per node type; stages
+    (parse, generate, zip) are wall-clock seconds summed over every sheet or
+    graph of the job, so parallel sub-runs can add up to more than the
+    job's elapsed time. With a trace every stage is also emitted as a span.
+    Node timings are taken for the models picked by time_nodes(); the
+    other models are only counted, and the summary scales time and bytes
+    up to every execution.
+    Safe to share between the threads of a job.
+    """
+
+    def __init__(
+        self,
+        trace: Optional[SessionTrace] = None,
+        first: int = NODE_TIMING_FIRST,
+        sample_every: int = NODE_TIMING_SAMPLE_EVERY,
+    ):
+        self._lock = threading.Lock()
+        self.first = first
+        self.sample_every = sample_every
+        # Shared with group views, so models are counted once per job
+        self._models = {'models': 0, 'timed_models': 0}
+        # (node id prefix, plan id) -> [prefix, plan, models run without timing]
+        self._untimed: Dict[Tuple[str, int], List[Any]] = {}
+        self._rng = random.Random(0)
+        self._nodes: Dict[str, Tuple[str, _Timing]] = {}
+        self._types: Dict[str, _Timing] = {}
+        self._stages: Dict[str, float] = {}
+        self._prefix = ''
+        self.trace = trace
+
+    def for_group(self, name: str) -> 'RunStats':
+        """Return a view recording into the same stats with node ids prefixed by "name/" (batch graphs)"""
+        view = copy.copy(self)
+        view._prefix = f"{self._prefix}{name}/"
+        if self.trace is not None:
+            view.trace = self.trace.for_group(name)
+        return view
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        """Add seconds to a stage (and emit it as a span that ended just now)"""
+        with self._lock:
+            self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+        if self.trace is not None:
+            self.trace.record(stage, seconds)
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """Time a block as a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(stage, time.perf_counter() - start)
+
+    def time_nodes(self, plan: List[Dict[str, Any]]) -> bool:
+        """
+        Count a model run through plan and return whether its nodes should be timed
+
+        A model that is not timed still counts as one execution of every node
+        of the plan (at the cost of one counter increment).
+        """
+        with self._lock:
+            occurrence = self._models['models']
+            self._models['models'] += 1
+            timed = occurrence < self.first or (occurrence - self.first) % self.sample_every == self.sample_every - 1
+            if timed:
+                self._models['timed_models'] += 1
+            else:
+                key = (self._prefix, id(plan))
+                untimed = self._untimed.get(key)
+                if untimed is None:
+                    untimed = self._untimed[key] = [self._prefix, plan, 0]
+                untimed[2] += 1
+            return timed
+
+    def add_nodes(self, records: List[Tuple[Dict[str, Any], float, int]]) -> None:
+        """
+        Record node executions, e.g. every node of one model
+
+        Args:
+            records: (node, seconds, bytes emitted) tuples
+        """
+        with self._lock:
+            for node, seconds, size in records:
+                node_type = str(node.get('type'))
+                node_id = self._prefix + str(node.get('id'))
+                entry = self._nodes.get(node_id)
+                if entry is None:
+                    entry = self._nodes[node_id] = (node_type, _Timing())
+                entry[1].add(seconds, size, self._rng)
+                timing = self._types.get(node_type)
+                if timing is None:
+                    timing = self._types[node_type] = _Timing()
+                timing.add(seconds, size, self._rng)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarise the job for results.summary
+
+        Returns:
+            Dict with 'stages' ({stage: seconds}), 'node_types' and 'nodes'
+            ({name: {count, timed_count, total_seconds, p95_seconds, bytes,
+            estimated}}, nodes also carrying their 'type'), slowest first, and
+            'node_timing' ({models, timed_models}). count covers every
+            execution; when some were not timed (estimated), total_seconds
+            and bytes are scaled up from the timed_count timed ones.
+        """
+        with self._lock:
+            node_untimed: Dict[str, int] = {}
+            type_untimed: Dict[str, int] = {}
+            nodes = dict(self._nodes)
+            for prefix, plan, models in self._untimed.values():
+                for node in plan:
+                    node_type = str(node.get('type'))
+                    node_id = prefix + str(node.get('id'))
+                    node_untimed[node_id] = node_untimed.get(node_id, 0) + models
+                    type_untimed[node_type] = type_untimed.get(node_type, 0) + models
+                    if node_id not in nodes:
+                        nodes[node_id] = (node_type, _Timing())
+            types = dict(self._types)
+            for node_type in type_untimed:
+                types.setdefault(node_type, _Timing())
+
+            type_summaries = {
+                node_type: timing.summary(type_untimed.get(node_type, 0)) for node_type, timing in types.items()
+            }
+            node_summaries = {
+                node_id: {'type': node_type, **timing.summary(node_untimed.get(node_id, 0))}
+                for node_id, (node_type, timing) in nodes.items()
+            }
+
+            def slowest_first(summaries: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+                return dict(sorted(summaries.items(), key=lambda item: item[1]['total_seconds'], reverse=True))
+
+            return {
+                'stages': {stage: round(seconds, 6) for stage, seconds in self._stages.items()},
+                'node_timing': dict(self._models),
+                'node_types': slowest_first(type_summaries),
+                'nodes': slowest_first(node_summaries),
+            }
+
+
+def optional_stage(stats: Optional[RunStats], stage: str) -> ContextManager[None]:
+    """stats.stage(stage), or a no-op context when stats is None"""
+    return nullcontext() if stats is None else stats.stage(stage)
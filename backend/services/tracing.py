@@ -0,0 +1,260 @@
+"""
+Tracing - Spans for the stages of a workflow session, written as JSON lines
+or handed to OpenTelemetry
+
+Every span of a session shares one trace id derived from the session id, so
+the upload, queue wait, parse, compile, per-model generation and archiving
+of a run can be found with the session id alone. Spans are flat: each is a
+child of the session's root span, which is emitted when the session ends.
+
+Configured with environment variables:
+
+    TRACE_EXPORTER      "" (off, default), "jsonl" or "otel"
+    TRACE_FILE          JSON lines file for the jsonl exporter (default traces/spans.jsonl)
+    TRACE_SAMPLE_RATE   Fraction of models that get a generation span (default 0.01)
+
+The otel exporter needs the opentelemetry-api package and a configured SDK
+to send the spans anywhere. OpenTelemetry picks its own trace and span ids,
+so there the root span is opened when the session starts and the other spans
+are created as its children; the session's trace id is kept as the
+"pychain.trace_id" attribute.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "").strip().lower()
+TRACE_FILE = Path(os.getenv("TRACE_FILE", "traces/spans.jsonl"))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+
+
+def trace_id_for(session_id: str) -> str:
+    """32 hex digit trace id of a session (the session UUID itself when it is one)"""
+    try:
+        return uuid.UUID(session_id).hex
+    except ValueError:
+        return hashlib.sha256(session_id.encode('utf-8')).hexdigest()[:32]
+
+
+def new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+class JsonlExporter:
+    """Appends one JSON object per span to a file"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def start(self, trace: 'SessionTrace') -> None:
+        """Nothing to do until spans end"""
+
+    def export(self, span: Dict[str, Any]) -> None:
+        line = json.dumps(span, default=str) + '\n'
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+class OtelExporter:
+    """
+    Re-creates each finished span on the OpenTelemetry tracer
+
+    The session's root span is started on the tracer with the trace and kept
+    open, so the other spans can be created as its children; finishing the
+    trace ends it.
+    """
+
+    def __init__(self):
+        from opentelemetry import context, trace
+
+        self._trace = trace
+        self._context = context
+        self._tracer = trace.get_tracer('pychain')
+        # Trace id -> open OpenTelemetry root span of the session
+        self._roots: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _start_span(self, name: str, parent, start_time: float, attributes: Dict[str, Any]):
+        context = self._context.Context() if parent is None else self._trace.set_span_in_context(parent)
+        return self._tracer.start_span(
+            name, context=context, start_time=int(start_time * 1e9), attributes=attributes,
+        )
+
+    def _attributes(self, span: Dict[str, Any]) -> Dict[str, Any]:
+        return {'session_id': span['session_id'], 'pychain.trace_id': span['trace_id'], **span['attributes']}
+
+    def start(self, trace: 'SessionTrace') -> None:
+        """Open the session's root span"""
+        root = self._start_span('session', None, trace.start_time, {
+            'session_id': trace.session_id, 'pychain.trace_id': trace.trace_id,
+        })
+        with self._lock:
+            self._roots[trace.trace_id] = root
+
+    def export(self, span: Dict[str, Any]) -> None:
+        otel = self._trace
+        if span['parent_id'] is None:
+            with self._lock:
+                otel_span = self._roots.pop(span['trace_id'], None)
+            if otel_span is None:
+                otel_span = self._start_span(span['name'], None, span['start_time'], {})
+            otel_span.set_attributes(self._attributes(span))
+        else:
+            with self._lock:
+                root = self._roots.get(span['trace_id'])
+            otel_span = self._start_span(span['name'], root, span['start_time'], self._attributes(span))
+        if span['status'] == 'error':
+            otel_span.set_status(otel.Status(otel.StatusCode.ERROR, span.get('error')))
+        otel_span.end(end_time=int((span['start_time'] + span['duration_seconds']) * 1e9))
+
+
+def create_exporter(kind: str):
+    """Exporter for a TRACE_EXPORTER value, or None when tracing is off"""
+    if kind == 'jsonl':
+        return JsonlExporter(TRACE_FILE)
+    if kind == 'otel':
+        try:
+            return OtelExporter()
+        except ImportError:
+            logger.warning("TRACE_EXPORTER=otel needs opentelemetry-api; tracing is off")
+            return None
+    if kind:
+        logger.warning(f"Unknown TRACE_EXPORTER {kind!r}; tracing is off")
+    return None
+
+
+exporter = create_exporter(TRACE_EXPORTER)
+
+
+class SessionTrace:
+    """
+    Records the spans of one workflow session
+
+    Safe to share between the threads of a job.
+    """
+
+    def __init__(self, session_id: str, exporter, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.session_id = session_id
+        self.trace_id = trace_id_for(session_id)
+        self.root_span_id = new_span_id()
+        self.start_time = time.time()
+        self.sample_rate = sample_rate
+        self.attributes: Dict[str, Any] = {}
+        self._exporter = exporter
+        self._rng = random.Random()
+        # Tracing must never fail a job
+        try:
+            exporter.start(self)
+        except Exception as e:
+            logger.warning(f"Could not start trace of session {session_id}: {e}")
+
+    def for_group(self, name: str) -> 'SessionTrace':
+        """Return a view whose spans carry the sheet or batch graph name as "group" """
+        view = copy.copy(self)
+        view.attributes = {**self.attributes, 'group': name}
+        return view
+
+    def record(
+        self,
+        name: str,
+        seconds: float,
+        error: Optional[BaseException] = None,
+        **attributes: Any,
+    ) -> None:
+        """
+        Emit a span that ended just now after the given seconds
+
+        Args:
+            name: Span name
+            seconds: Span duration
+            error: Exception that ended the span, if any
+            attributes: Extra span attributes
+        """
+        end_time = time.time()
+        span = {
+            'trace_id': self.trace_id,
+            'span_id': new_span_id(),
+            'parent_id': self.root_span_id,
+            'name': name,
+            'session_id': self.session_id,
+            'start_time': round(end_time - seconds, 6),
+            'duration_seconds': round(seconds, 6),
+            'status': 'error' if error is not None else 'ok',
+            'attributes': {
+                key: value for key, value in {**self.attributes, **attributes}.items() if value is not None
+            },
+        }
+        if error is not None:
+            span['error'] = f"{type(error).__name__}: {error}"
+        self._export(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[None]:
+        """Time a block as a span"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.record(name, time.perf_counter() - start, error=e, **attributes)
+            raise
+        self.record(name, time.perf_counter() - start, **attributes)
+
+    def sampled(self) -> bool:
+        """Whether the next per-model span should be recorded"""
+        return self.sample_rate >= 1 or self._rng.random() < self.sample_rate
+
+    def finish(self, status: str) -> None:
+        """Emit the session's root span, from when the trace started until now"""
+        end_time = time.time()
+        self._export({
+            'trace_id': self.trace_id,
+            'span_id': self.root_span_id,
+            'parent_id': None,
+            'name': 'session',
+            'session_id': self.session_id,
+            'start_time': round(self.start_time, 6),
+            'duration_seconds': round(end_time - self.start_time, 6),
+            'status': 'error' if status == 'error' else 'ok',
+            'attributes': {**self.attributes, 'session_status': status},
+        })
+
+    def _export(self, span: Dict[str, Any]) -> None:
+        # Tracing must never fail a job
+        try:
+            self._exporter.export(span)
+        except Exception as e:
+            logger.warning(f"Could not export span {span['name']}: {e}")
+
+
+def start_trace(session_id: str) -> Optional[SessionTrace]:
+    """Start the trace of a session, or return None when tracing is off"""
+    if exporter is None:
+        return None
+    return SessionTrace(session_id, exporter)
+
+
+def optional_span(trace: Optional[SessionTrace], name: str, **attributes: Any) -> ContextManager[None]:
+    """trace.span(name), or a no-op context when trace is None"""
+    return nullcontext() if trace is None else trace.span(name, **attributes)
+
+
+def sampled_span(trace: Optional[SessionTrace], name: str, **attributes: Any) -> ContextManager[None]:
+    """trace.span(name) for a TRACE_SAMPLE_RATE fraction of calls, otherwise a no-op context"""
+    if trace is None or not trace.sampled():
+        return nullcontext()
+    return trace.span(name, **attributes)
@@ -5,11 +5,18 @@ Workflow Runner - Executes node-based workflow graphs to generate chain files
 import os
 import json
 import re
-from typing import Dict, List, Optional, Any, Tuple
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
-from utils.data_loader import load_naming_data
+from utils.data_loader import open_workbook, read_model_names, read_model_table
+from utils.model_list_cache import file_sha256, model_list_cache
+from services.run_stats import RunStats, optional_stage
+from services.tracing import sampled_span
+from services.run_log import RunLogger, names_of
 
 # Import command generators
 from commands.metadata import (
@@ -59,6 +66,41 @@ from commands.design.create_mtf_file import create_mtf_file
 from commands.design.create_template_file import create_template
 from commands.functions import function_command
 
+logger = logging.getLogger(__name__)
+run_log = RunLogger(logger)
+
+
+class WorkflowCancelled(Exception):
+    """Raised when a run is cancelled; carries how many chain files were completed"""
+
+    def __init__(self, completed: int):
+        super().__init__(f"Workflow cancelled after {completed} models")
+        self.completed = completed
+
+
+# Per-row columns of the model list are exposed to templates as {col.<name>}
+ROW_COLUMN_PREFIX = 'col.'
+_ROW_COLUMN_REFERENCE = re.compile(r'(^|[{"])' + re.escape(ROW_COLUMN_PREFIX))
+
+
+def uses_row_columns(workflow_graph: Dict[str, Any], variables: List[Dict[str, Any]]) -> bool:
+    """
+    Check whether any node or variable references a per-row column
+    
+    Reading every column of the model list is only worth doing when a
+    {col.<name>} token (or a bare col.<name> variable reference) is used.
+    """
+    text = json.dumps([workflow_graph.get('nodes', []), variables])
+    return bool(_ROW_COLUMN_REFERENCE.search(text))
+
+
+def row_column_vars(row_columns: Dict[str, List[str]], row_index: int) -> Dict[str, str]:
+    """Build the {col.<name>} variables for one row of the model table"""
+    return {
+        ROW_COLUMN_PREFIX + name: values[row_index]
+        for name, values in row_columns.items()
+    }
+
 
 def resolve_variable(
     var_name: str,
@@ -308,10 +350,14 @@ def execute_node(
         pattern_search = resolve_variable(pattern_search_token, model_name, variables, per_run_vars)
         command_name = resolve_variable(data.get('commandName', 'Rename model'), model_name, variables, per_run_vars)
         
-        # Debug logging
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"RenameModel: patternSearch token='{pattern_search_token}', resolved='{pattern_search}', variables={[v.get('name') for v in variables]}, per_run_vars={list(per_run_vars.keys())}")
+        run_log.model_event(
+            'renameModel',
+            model=model_name,
+            pattern_search_token=pattern_search_token,
+            pattern_search=pattern_search,
+            variables=names_of(variables),
+            per_run_vars=names_of(per_run_vars),
+        )
         xml_content.extend(rename_model_command(command_name, pattern_replace, pattern_search, continue_on_failure, comments))
     
     elif node_type == 'getTotalSurfaceArea':
@@ -530,44 +576,40 @@ def execute_node(
             pass
 
 
-def build_command_chain(
+# Node types that only shape the flow and never generate commands
+CONTROL_FLOW_TYPES = {'foreachModel', 'chainFileOutput', 'excelModels', 'setVariable'}
+
+
+def is_flow_edge(edge: Dict[str, Any]) -> bool:
+    """Check if an edge is a control-flow edge (not a parameter/data edge)"""
+    source_handle = edge.get('sourceHandle', '')
+    target_handle = edge.get('targetHandle', '')
+    # Flow edges have flow: prefix or no prefix (legacy)
+    # Parameter edges have param: prefix, value edges have value: prefix
+    if source_handle and not source_handle.startswith('flow:') and ':' in source_handle:
+        return False
+    if target_handle and not target_handle.startswith('flow:') and ':' in target_handle:
+        return False
+    return True
+
+
+def compile_workflow(
     nodes: List[Dict[str, Any]],
     edges: List[Dict[str, Any]],
-    model_name: str,
-    variables: List[Dict[str, Any]],
-    per_run_vars: Dict[str, Any],
-    model_type: str = 'Model',
-    output_folder: str = '',
-) -> List[str]:
+) -> List[Dict[str, Any]]:
     """
-    Build the command chain XML for a single model
+    Compile a workflow graph into the ordered list of nodes executed per model
+    
+    The order only depends on the graph, so it is computed once per run and
+    reused for every model.
     
     Args:
         nodes: List of node definitions
         edges: List of edge definitions
-        model_name: Current model name
-        variables: Variable bindings
-        per_run_vars: Per-run variable values
-        model_type: 'Model' or 'TIN'
     
     Returns:
-        List of XML lines for the command chain
+        Command-generating nodes in execution order
     """
-    xml_content: List[str] = []
-    
-    # Helper: identify flow edges (ignore param: and value: edges)
-    def is_flow_edge(edge: Dict[str, Any]) -> bool:
-        """Check if an edge is a control-flow edge (not a parameter/data edge)"""
-        source_handle = edge.get('sourceHandle', '')
-        target_handle = edge.get('targetHandle', '')
-        # Flow edges have flow: prefix or no prefix (legacy)
-        # Parameter edges have param: prefix, value edges have value: prefix
-        if source_handle and not source_handle.startswith('flow:') and ':' in source_handle:
-            return False
-        if target_handle and not target_handle.startswith('flow:') and ':' in target_handle:
-            return False
-        return True
-    
     # Try the original foreach → chainFileOutput path first (for classic graphs)
     foreach_node = next((n for n in nodes if n.get('type') == 'foreachModel'), None)
     chain_output_nodes = [n for n in nodes if n.get('type') == 'chainFileOutput']
@@ -617,24 +659,22 @@ def build_command_chain(
             found = find_path(foreach_id, [foreach_id])
             if not found:
                 # Log warning if no path found (but don't fail - fall through to topological sort)
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"No path found from foreachModel node {foreach_id} to any chainFileOutput node. Falling back to topological sort.")
+                run_log.warning('no_foreach_path', foreach_node=foreach_id, fallback='topological sort')
             else:
-                # Execute nodes in the discovered order
+                # Keep nodes in the discovered order
                 # Filter out control-flow nodes that don't generate commands
-                control_flow_types = {'foreachModel', 'chainFileOutput', 'excelModels', 'setVariable'}
+                plan: List[Dict[str, Any]] = []
                 for node_id in execution_order:
                     node = next((n for n in nodes if str(n.get('id')) == str(node_id)), None)
                     if node:
                         node_type = node.get('type')
                         # Only execute nodes that generate commands (skip control-flow nodes)
-                        if node_type not in control_flow_types:
-                            execute_node(node, model_name, variables, per_run_vars, xml_content, output_folder)
+                        if node_type not in CONTROL_FLOW_TYPES:
+                            plan.append(node)
                 
-                # If we found a path and executed nodes, return the XML content
+                # If we found a path, use it as the plan
                 if execution_order:
-                    return xml_content
+                    return plan
     
     # Fallback: no foreach node – build a generic topological order using flow edges only
     # This allows workflows that don't use the Foreach Model node.
@@ -647,8 +687,6 @@ def build_command_chain(
     
     # Build adjacency and indegree from flow edges
     # Only include edges where both source and target nodes exist
-    import logging
-    logger = logging.getLogger(__name__)
     for edge in edges:
         if not is_flow_edge(edge):
             continue
@@ -661,9 +699,9 @@ def build_command_chain(
         else:
             # Log warning if edge references non-existent node (helps debug paste issues)
             if source_id not in adjacency:
-                logger.warning(f"Edge references non-existent source node: {source_id}")
+                run_log.warning('edge_missing_source', source=source_id, target=target_id)
             if target_id not in adjacency:
-                logger.warning(f"Edge references non-existent target node: {target_id}")
+                run_log.warning('edge_missing_target', source=source_id, target=target_id)
     
     # Kahn's algorithm for topological sort
     queue: List[str] = [node_id for node_id, deg in indegree.items() if deg == 0]
@@ -677,17 +715,69 @@ def build_command_chain(
             if indegree[neighbor] == 0:
                 queue.append(neighbor)
     
-    # Execute nodes in computed order
+    # Keep nodes in computed order
     # Filter out control-flow nodes that don't generate commands
-    control_flow_types = {'foreachModel', 'chainFileOutput', 'excelModels', 'setVariable'}
+    plan = []
     for node_id in execution_order:
         node = id_to_node.get(node_id)
         if node:
             node_type = node.get('type')
             # Only execute nodes that generate commands (skip control-flow nodes)
-            if node_type not in control_flow_types:
-                execute_node(node, model_name, variables, per_run_vars, xml_content, output_folder)
+            if node_type not in CONTROL_FLOW_TYPES:
+                plan.append(node)
+    
+    return plan
+
+
+def build_command_chain(
+    nodes: List[Dict[str, Any]],
+    edges: List[Dict[str, Any]],
+    model_name: str,
+    variables: List[Dict[str, Any]],
+    per_run_vars: Dict[str, Any],
+    model_type: str = 'Model',
+    output_folder: str = '',
+    plan: Optional[List[Dict[str, Any]]] = None,
+    stats: Optional[RunStats] = None,
+) -> List[str]:
+    """
+    Build the command chain XML for a single model
+    
+    Args:
+        nodes: List of node definitions
+        edges: List of edge definitions
+        model_name: Current model name
+        variables: Variable bindings
+        per_run_vars: Per-run variable values
+        model_type: 'Model' or 'TIN'
+        plan: Execution plan from compile_workflow (compiled here if not given)
+        stats: Counts the model's node executions when given, and records the
+            time and output size of every node when stats.time_nodes() picks it
     
+    Returns:
+        List of XML lines for the command chain
+    """
+    if plan is None:
+        plan = compile_workflow(nodes, edges)
+    
+    xml_content: List[str] = []
+    if stats is None or not stats.time_nodes(plan):
+        for node in plan:
+            execute_node(node, model_name, variables, per_run_vars, xml_content, output_folder)
+        return xml_content
+    
+    records = []
+    for node in plan:
+        first_line = len(xml_content)
+        start = time.perf_counter()
+        execute_node(node, model_name, variables, per_run_vars, xml_content, output_folder)
+        seconds = time.perf_counter() - start
+        # Size as written to the chain file, one newline per line
+        emitted = xml_content[first_line:]
+        text = ''.join(emitted)
+        size = (len(text) if text.isascii() else len(text.encode('utf-8'))) + len(emitted)
+        records.append((node, seconds, size))
+    stats.add_nodes(records)
     return xml_content
 
 
@@ -699,6 +789,8 @@ def generate_chain_file(
     per_run_vars: Dict[str, Any],
     output_folder: str,
     project_folder: str = '',
+    plan: Optional[List[Dict[str, Any]]] = None,
+    stats: Optional[RunStats] = None,
 ) -> Optional[str]:
     """
     Generate a single chain file for a model
@@ -711,6 +803,8 @@ def generate_chain_file(
         per_run_vars: Per-run variable values
         output_folder: Output folder path
         project_folder: Project folder path
+        plan: Execution plan from compile_workflow (compiled here if not given)
+        stats: Records the time and output size of every node when given
     
     Returns:
         Path to generated chain file or None
@@ -735,7 +829,7 @@ def generate_chain_file(
     xml_content.extend(generate_chain_settings())
     
     # Build command chain from graph
-    command_xml = build_command_chain(nodes, edges, model_name, variables, per_run_vars, model_type, output_folder)
+    command_xml = build_command_chain(nodes, edges, model_name, variables, per_run_vars, model_type, output_folder, plan, stats)
     xml_content.extend(command_xml)
     
     # Always add closing scaffolding
@@ -749,54 +843,101 @@ def generate_chain_file(
     return output_file
 
 
+def load_model_list(
+    excel_file_path: str,
+    selected_column_index: int = 0,
+    excel_hash: Optional[str] = None,
+    sheet_name: Optional[str] = None,
+    with_row_columns: bool = False,
+    workbook=None,
+) -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    Load the cleaned model names (and optionally their row columns) for a run
+    
+    Results are cached by file content, sheet and column, so repeat runs of
+    the same file skip parsing.
+    
+    Args:
+        excel_file_path: Path to the model list (Excel, CSV, Parquet or JSON/NDJSON)
+        selected_column_index: Which column to read model names from (0-based)
+        excel_hash: SHA-256 of the model list file if already known (computed otherwise)
+        sheet_name: Excel sheet to read model names from (default: first sheet)
+        with_row_columns: Also read every column of the model rows
+        workbook: Already open workbook to read the sheet from (see open_workbook)
+    
+    Returns:
+        Tuple of (model names, dict of column name to per-model values)
+    """
+    if excel_hash is None:
+        excel_hash = file_sha256(excel_file_path)
+    sheet_key = sheet_name if sheet_name is not None else 0
+    
+    if with_row_columns:
+        table_key = ('table', selected_column_index)
+        model_table = model_list_cache.get(excel_hash, sheet_key, table_key)
+        if model_table is None:
+            model_table = read_model_table(excel_file_path, selected_column_index, sheet_name, workbook)
+            model_list_cache.put(excel_hash, sheet_key, table_key, model_table)
+        model_names, row_columns = model_table
+        return list(model_names), row_columns
+    
+    model_names = model_list_cache.get(excel_hash, sheet_key, selected_column_index)
+    if model_names is None:
+        model_names = read_model_names(excel_file_path, selected_column_index, sheet_name, workbook)
+        model_list_cache.put(excel_hash, sheet_key, selected_column_index, model_names)
+    return model_names, {}
+
+
 def run_workflow(
     excel_file_path: str,
     workflow_graph: Dict[str, Any],
     variables: List[Dict[str, Any]],
     output_folder: str,
     selected_column_index: int = 0,
+    excel_hash: Optional[str] = None,
+    sheet_name: Optional[str] = None,
+    model_list: Optional[Tuple[List[str], Dict[str, List[str]]]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    on_file: Optional[Callable[[str], None]] = None,
+    stats: Optional[RunStats] = None,
 ) -> Tuple[List[str], Optional[str], List[Dict[str, str]]]:
     """
-    Run a workflow graph for all models in Excel file
+    Run a workflow graph for all models in a model list file
     
     Args:
-        excel_file_path: Path to Excel file
+        excel_file_path: Path to the model list (Excel, CSV, Parquet or JSON/NDJSON)
         workflow_graph: Workflow graph JSON (nodes and edges)
         variables: Variable bindings
         output_folder: Output folder path
         selected_column_index: Which column to read model names from (0-based)
+        excel_hash: SHA-256 of the model list file if already known (computed otherwise)
+        sheet_name: Excel sheet to read model names from (default: first sheet)
+        model_list: Already loaded (model names, row columns) from load_model_list
+        cancel_event: When set, the run stops before the next model
+        on_file: Called with the path of each chain file as soon as it is written
+        stats: Records the parse, compile and generate stages and every node execution
+            when given (and, with a trace, a sampled span per model)
     
     Returns:
         Tuple of (generated file paths, project folder, file details)
+    
+    Raises:
+        WorkflowCancelled: If cancel_event was set before all models were done
     """
-    # Parse Excel to get model names
-    # Read Excel file directly without header to ensure we get ALL rows including first
-    # This prevents pandas from treating the first row as a header and losing it
-    try:
-        df_raw = pd.read_excel(excel_file_path, engine='openpyxl', header=None)
-        # Use the selected column index (clamped to valid range)
-        col_index = min(selected_column_index, max(0, len(df_raw.columns) - 1))
-        model_names_raw = df_raw.iloc[:, col_index].astype(str).tolist()
-    except Exception as e:
-        # Fallback to using load_naming_data if direct read fails
-        naming_data = load_naming_data(excel_file_path)
-        if naming_data is None:
-            raise ValueError("Error loading naming data from Excel file")
-        model_names_raw = naming_data.iloc[:, 0].astype(str).tolist()
-    
-    # Filter out empty strings and 'nan'
-    # Check if first value looks like a header (common header names)
-    common_headers = ['filename', 'name', 'model', 'model_name', 'model name']
-    model_names = []
-    for i, m in enumerate(model_names_raw):
-        m_clean = m.strip() if m else ''
-        # Skip if empty or 'nan'
-        if not m_clean or m_clean.lower() == 'nan':
-            continue
-        # Skip first row only if it matches a common header name
-        if i == 0 and m_clean.lower() in common_headers:
-            continue
-        model_names.append(m_clean)
+    start = time.perf_counter()
+    
+    # Parse the model list (cached by content), reading per-row columns only when used
+    if model_list is None:
+        with optional_stage(stats, 'parse'):
+            model_list = load_model_list(
+                excel_file_path,
+                selected_column_index,
+                excel_hash,
+                sheet_name,
+                with_row_columns=uses_row_columns(workflow_graph, variables),
+            )
+    model_names, row_columns = model_list
+    row_indexes = list(range(len(model_names)))
     
     # Extract nodes and edges from graph
     nodes = workflow_graph.get('nodes', [])
@@ -806,7 +947,7 @@ def run_workflow(
     selected_model_names = workflow_graph.get('selectedModelNames') or []
     if selected_model_names:
         selected_set = {str(name) for name in selected_model_names}
-        model_names = [m for m in model_names if str(m) in selected_set]
+        row_indexes = [i for i in row_indexes if str(model_names[i]) in selected_set]
     
     # Build per-run variables
     per_run_vars = {}
@@ -832,27 +973,301 @@ def run_workflow(
     # Get project folder value from per-run variables (may be empty if not set)
     project_folder = per_run_vars.get(project_folder_var_name, '')
     
+    # The execution order only depends on the graph, so compile it once for all models
+    with optional_stage(stats, 'compile'):
+        plan = compile_workflow(nodes, edges)
+    trace = stats.trace if stats is not None else None
+    
     generated_files = []
     file_details = []
     
     # Generate chain file for each model
-    for model_name in model_names:
-        chain_file = generate_chain_file(
-            model_name,
-            nodes,
-            edges,
-            variables,
-            per_run_vars,
-            output_folder,
-            project_folder,
-        )
-        if chain_file:
-            generated_files.append(chain_file)
-            file_details.append({
-                'filename': os.path.basename(chain_file),
-                'output_path': chain_file,
-                'project_folder': project_folder,
-            })
-    
+    with optional_stage(stats, 'generate'), run_log.run():
+        for row_index in row_indexes:
+            if cancel_event is not None and cancel_event.is_set():
+                raise WorkflowCancelled(len(generated_files))
+            model_name = model_names[row_index]
+            model_vars = per_run_vars
+            if row_columns:
+                model_vars = {**per_run_vars, **row_column_vars(row_columns, row_index)}
+            with sampled_span(trace, 'model', model=model_name, sheet=sheet_name):
+                chain_file = generate_chain_file(
+                    model_name,
+                    nodes,
+                    edges,
+                    variables,
+                    model_vars,
+                    output_folder,
+                    project_folder,
+                    plan,
+                    stats,
+                )
+            if chain_file:
+                generated_files.append(chain_file)
+                file_details.append({
+                    'filename': os.path.basename(chain_file),
+                    'output_path': chain_file,
+                    'project_folder': project_folder,
+                })
+                if on_file is not None:
+                    on_file(chain_file)
+    
+    run_log.summary(
+        'run_finished',
+        sheet=sheet_name,
+        models=len(row_indexes),
+        files=len(generated_files),
+        nodes=len(plan),
+        seconds=round(time.perf_counter() - start, 3),
+    )
     return generated_files, project_folder, file_details
 
+
+# Number of batch graphs run at the same time on a thread pool. Chain
+# generation is pure Python and holds the GIL, so the threads only overlap
+# file reads and writes; they do not use more than one core.
+WORKFLOW_MAX_WORKERS = int(os.getenv("WORKFLOW_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def collect_results(futures: Dict[str, Any]) -> Dict[str, Tuple[List[str], Optional[str], List[Dict[str, str]]]]:
+    """
+    Wait for every run_workflow future, in order
+    
+    Raises:
+        WorkflowCancelled: If any run was cancelled, with the chain files completed across all runs
+    """
+    results = {}
+    cancelled_completed = None
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except WorkflowCancelled as e:
+            cancelled_completed = (cancelled_completed or 0) + e.completed
+    if cancelled_completed is not None:
+        raise WorkflowCancelled(cancelled_completed + sum(len(r[0]) for r in results.values()))
+    return results
+
+
+def safe_folder_name(name: str) -> str:
+    """Turn a sheet or graph name into a safe folder name for the output and ZIP"""
+    name = re.sub(r'[<>:"/\\|?*]', '_', str(name)).strip().strip('.')
+    return name or 'output'
+
+
+def make_output_folders(names: List[str], output_folder: str) -> Dict[str, str]:
+    """
+    Create one sub-folder of output_folder per name
+    
+    Names that clash once sanitised (case-insensitively) get a numeric suffix.
+    
+    Returns:
+        Dict of name to folder path
+    """
+    folders: Dict[str, str] = {}
+    used_folders = set()
+    for name in names:
+        folder_name = safe_folder_name(name)
+        candidate = folder_name
+        suffix = 2
+        while candidate.lower() in used_folders:
+            candidate = f"{folder_name}_{suffix}"
+            suffix += 1
+        used_folders.add(candidate.lower())
+        folders[name] = os.path.join(output_folder, candidate)
+        os.makedirs(folders[name], exist_ok=True)
+    return folders
+
+
+def run_workbook(
+    excel_file_path: str,
+    workflow_graph: Dict[str, Any],
+    variables: List[Dict[str, Any]],
+    output_folder: str,
+    selected_column_index: int = 0,
+    excel_hash: Optional[str] = None,
+    cancel_event: Optional[threading.Event] = None,
+    on_file: Optional[Callable[[str], None]] = None,
+    stats: Optional[RunStats] = None,
+) -> Dict[str, Tuple[List[str], Optional[str], List[Dict[str, str]]]]:
+    """
+    Run a workflow graph for every sheet of an Excel workbook
+    
+    The workbook is opened (and its shared strings parsed) once to read the
+    model list of every sheet. The sheets are then generated one after
+    another, each into its own sub-folder of output_folder.
+    
+    Args:
+        excel_file_path: Path to Excel file
+        workflow_graph: Workflow graph JSON (nodes and edges)
+        variables: Variable bindings
+        output_folder: Output folder path (one sub-folder per sheet is created)
+        selected_column_index: Which column to read model names from (0-based)
+        excel_hash: SHA-256 of the Excel file if already known (computed otherwise)
+        cancel_event: When set, the run stops before its next model
+        on_file: Called with the path of each chain file as soon as it is written
+        stats: Shared by every sheet, so the same node is summed across sheets
+    
+    Returns:
+        Dict of sheet name to the run_workflow result for that sheet, in workbook order
+    
+    Raises:
+        WorkflowCancelled: If cancel_event was set, with the chain files completed across sheets
+    """
+    if excel_hash is None:
+        excel_hash = file_sha256(excel_file_path)
+    with_row_columns = uses_row_columns(workflow_graph, variables)
+    
+    workbook = open_workbook(excel_file_path)
+    try:
+        sheet_names = list(workbook.sheetnames)
+        with optional_stage(stats, 'parse'):
+            model_lists = {
+                sheet_name: load_model_list(
+                    excel_file_path,
+                    selected_column_index,
+                    excel_hash,
+                    sheet_name,
+                    with_row_columns=with_row_columns,
+                    workbook=workbook,
+                )
+                for sheet_name in sheet_names
+            }
+    finally:
+        workbook.close()
+    
+    sheet_folders = make_output_folders(sheet_names, output_folder)
+    
+    results = {}
+    for sheet_name in sheet_names:
+        try:
+            results[sheet_name] = run_workflow(
+                excel_file_path,
+                workflow_graph,
+                variables,
+                sheet_folders[sheet_name],
+                selected_column_index,
+                excel_hash,
+                sheet_name,
+                model_lists[sheet_name],
+                cancel_event=cancel_event,
+                on_file=on_file,
+                stats=stats,
+            )
+        except WorkflowCancelled as e:
+            raise WorkflowCancelled(e.completed + sum(len(r[0]) for r in results.values()))
+    
+    for sheet_name, (_, _, file_details) in results.items():
+        for detail in file_details:
+            detail['sheet'] = sheet_name
+    return results
+
+
+def workflow_names(workflows: Any) -> List[str]:
+    """
+    Check the entries of a batch and return their names
+    
+    Args:
+        workflows: Parsed "workflows" JSON, a non-empty list of
+            {"name" (optional), "workflow_graph": {...}, "variables": [...]}
+    
+    Returns:
+        Name of each graph ("workflow_<n>" when it has none), in order
+    
+    Raises:
+        ValueError: If an entry is malformed or two graphs share a name
+    """
+    if not isinstance(workflows, list) or not workflows:
+        raise ValueError("workflows must be a non-empty JSON list")
+    names = []
+    for i, workflow in enumerate(workflows):
+        if not isinstance(workflow, dict):
+            raise ValueError(f"workflows[{i}] must be an object")
+        if not isinstance(workflow.get('workflow_graph'), dict):
+            raise ValueError(f"workflows[{i}].workflow_graph must be an object")
+        if not isinstance(workflow.get('variables'), list):
+            raise ValueError(f"workflows[{i}].variables must be a list")
+        name = workflow.get('name')
+        if name is not None and not isinstance(name, (str, int, float)):
+            raise ValueError(f"workflows[{i}].name must be a string")
+        names.append(str(name or f"workflow_{i + 1}"))
+    if len(set(names)) != len(names):
+        raise ValueError("Batch workflow names must be unique")
+    return names
+
+
+def run_batch(
+    excel_file_path: str,
+    workflows: List[Dict[str, Any]],
+    output_folder: str,
+    selected_column_index: int = 0,
+    excel_hash: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    cancel_event: Optional[threading.Event] = None,
+    on_file: Optional[Callable[[str], None]] = None,
+    stats: Optional[RunStats] = None,
+) -> Dict[str, Tuple[List[str], Optional[str], List[Dict[str, str]]]]:
+    """
+    Run several workflow graphs against one model list
+    
+    The model list is parsed once and shared; each graph is compiled once and
+    runs into its own sub-folder of output_folder. Graphs run on a thread
+    pool, which overlaps their file I/O but not their (GIL-bound) generation.
+    
+    Args:
+        excel_file_path: Path to the model list (Excel, CSV, Parquet or JSON/NDJSON)
+        workflows: List of {"name", "workflow_graph", "variables"} entries
+        output_folder: Output folder path (one sub-folder per graph is created)
+        selected_column_index: Which column to read model names from (0-based)
+        excel_hash: SHA-256 of the model list file if already known (computed otherwise)
+        max_workers: Number of graphs processed at once (default WORKFLOW_MAX_WORKERS)
+        cancel_event: When set, every graph stops before its next model
+        on_file: Called with the path of each chain file as soon as it is written
+        stats: Records the job's timings; node ids are prefixed with the graph name
+    
+    Returns:
+        Dict of graph name to the run_workflow result for that graph, in request order
+    
+    Raises:
+        ValueError: If the workflows are malformed (see workflow_names)
+    """
+    names = workflow_names(workflows)
+    
+    # Parse the model list once for every graph
+    needs_columns = [
+        uses_row_columns(workflow.get('workflow_graph') or {}, workflow.get('variables') or [])
+        for workflow in workflows
+    ]
+    with optional_stage(stats, 'parse'):
+        model_names, row_columns = load_model_list(
+            excel_file_path,
+            selected_column_index,
+            excel_hash,
+            with_row_columns=any(needs_columns),
+        )
+    
+    graph_folders = make_output_folders(names, output_folder)
+    workers = max(1, min(max_workers or WORKFLOW_MAX_WORKERS, len(workflows) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            name: executor.submit(
+                run_workflow,
+                excel_file_path,
+                workflow.get('workflow_graph') or {},
+                workflow.get('variables') or [],
+                graph_folders[name],
+                selected_column_index,
+                excel_hash,
+                None,
+                (model_names, row_columns if needs_row_columns else {}),
+                cancel_event,
+                on_file,
+                stats.for_group(name) if stats is not None else None,
+            )
+            for name, workflow, needs_row_columns in zip(names, workflows, needs_columns)
+        }
+        results = collect_results(futures)
+    
+    for name, (_, _, file_details) in results.items():
+        for detail in file_details:
+            detail['workflow'] = name
+    return results
@@ -0,0 +1,9 @@
+"""
+Test configuration - puts the backend folder on sys.path so tests import the
+app modules the same way main.py does
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
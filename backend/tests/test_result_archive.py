@@ -0,0 +1,77 @@
+"""
+Result archive tests - every compression method must produce ZIPs that
+zipfile reads back intact, with and without precompressed entries
+"""
+
+import random
+import zipfile
+
+import pytest
+
+from services.result_archive import COMPRESSION_METHODS, PRECOMPRESSED_ENTRIES, ResultArchiveWriter, resolve_compression
+
+# Random hex lines so entries do not compress away and parts really split
+MODELS = {
+    f"sheet/model {i:02d}.chain": ''.join(
+        f"<Line>{random.Random(i * 1000 + j).getrandbits(128):032x}</Line>\n" for j in range(20 + 10 * i)
+    ).encode('utf-8')
+    for i in range(12)
+}
+# Non-ASCII name as written by models with Unicode names
+MODELS['sheet/modèle – 13.chain'] = b'<Chain>13</Chain>\n' * 40
+
+PRECOMPRESS_MODES = [False] + ([True] if PRECOMPRESSED_ENTRIES else [])
+
+
+def write_models(tmp_path, archive_path, compression, precompress, max_workers, max_part_bytes=None):
+    method, level = resolve_compression(compression)
+    writer = ResultArchiveWriter(
+        archive_path,
+        max_part_bytes=max_part_bytes,
+        compression=method,
+        compresslevel=level,
+        max_workers=max_workers,
+        precompress=precompress,
+    )
+    for i, (name, data) in enumerate(MODELS.items()):
+        source = tmp_path / f"source-{i}.chain"
+        source.write_bytes(data)
+        writer.add(source, name)
+    return writer.close()
+
+
+def read_back(zip_paths):
+    contents = {}
+    for zip_path in zip_paths:
+        with zipfile.ZipFile(zip_path) as zipf:
+            assert zipf.testzip() is None
+            for name in zipf.namelist():
+                contents[name] = zipf.read(name)
+    return contents
+
+
+@pytest.mark.parametrize('precompress', PRECOMPRESS_MODES)
+@pytest.mark.parametrize('max_workers', [1, 3])
+@pytest.mark.parametrize('compression', sorted(COMPRESSION_METHODS))
+def test_single_archive_round_trip(tmp_path, compression, max_workers, precompress):
+    archive_path = tmp_path / 'results.zip'
+    parts = write_models(tmp_path, archive_path, compression, precompress, max_workers)
+
+    assert len(parts) == 1
+    assert read_back([archive_path]) == MODELS
+    method, _ = resolve_compression(compression)
+    with zipfile.ZipFile(archive_path) as zipf:
+        assert {info.compress_type for info in zipf.infolist()} == {method}
+
+
+@pytest.mark.parametrize('precompress', PRECOMPRESS_MODES)
+@pytest.mark.parametrize('compression', sorted(COMPRESSION_METHODS))
+def test_parted_archive_round_trip(tmp_path, compression, precompress):
+    max_part_bytes = 4000
+    parts = write_models(tmp_path, tmp_path / 'parts', compression, precompress, 2, max_part_bytes)
+
+    assert len(parts) > 1
+    for part in parts:
+        # A part only goes over the limit when it holds a single oversized entry
+        assert part['size'] <= max_part_bytes or len(part['files']) == 1
+    assert read_back([part['path'] for part in parts]) == MODELS
@@ -1,16 +1,14 @@
 import os
+import csv
+import itertools
+import json
 import pandas as pd
-import unicodedata
+from openpyxl import load_workbook
+from utils.unicode_text import normalize_text, normalize_text_column, normalize_texts
 
 def normalize_unicode_string(text):
     """Normalize Unicode characters to prevent encoding issues."""
-    if isinstance(text, str):
-        # Normalize Unicode characters
-        normalized = unicodedata.normalize('NFKC', text)
-        # Replace en-dash with regular hyphen to prevent encoding issues
-        normalized = normalized.replace('–', '-')
-        return normalized
-    return text
+    return normalize_text(text)
 
 def load_naming_data(excel_path, header=None):
     """Loads model naming data from an Excel file.
@@ -38,10 +36,10 @@ def load_naming_data(excel_path, header=None):
             else:
                 df.columns = [f'col_{i}' for i in range(len(df.columns))]
         
-        # Normalize Unicode characters in all string columns
+        # Normalize Unicode characters in all string columns (whole column at a time)
         for column in df.columns:
-            if df[column].dtype == 'object':  # String columns
-                df[column] = df[column].apply(normalize_unicode_string)
+            if pd.api.types.is_string_dtype(df[column].dtype):  # String columns (object or str dtype)
+                df[column] = normalize_text_column(df[column])
         
         # make column names lowercase and replace spaces with underscores for easier access
         df.columns = df.columns.str.lower().str.replace(' ', '_')
@@ -51,4 +49,325 @@ def load_naming_data(excel_path, header=None):
         return None
     except Exception as e:
         print(f"Error reading Excel file: {e}")
-        return None 
\ No newline at end of file
+        return None
+
+
+# Model list file formats accepted by the workflow runner
+MODEL_LIST_EXTENSIONS = ('.xlsx', '.csv', '.parquet', '.json', '.ndjson', '.jsonl')
+
+# Values treated as a header when found in the first row of the model column
+COMMON_MODEL_HEADERS = ['filename', 'name', 'model', 'model_name', 'model name']
+
+
+def clean_model_names(model_names_raw):
+    """Strip and normalize model names, dropping empty/'nan' values and a recognised header row."""
+    model_names = []
+    for i, m in enumerate(model_names_raw):
+        m_clean = m.strip() if m else ''
+        # Skip if empty or 'nan'
+        if not m_clean or m_clean.lower() == 'nan':
+            continue
+        # Skip first row only if it matches a common header name
+        if i == 0 and m_clean.lower() in COMMON_MODEL_HEADERS:
+            continue
+        model_names.append(m_clean)
+    return normalize_texts(model_names)
+
+
+def _cell_to_str(value):
+    """Convert a cell value to the string form used for model names ('' for empty cells)."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _row_width(row):
+    """Number of cells up to and including the last non-empty one."""
+    for i in range(len(row) - 1, -1, -1):
+        if row[i] is not None and row[i] != '':
+            return i + 1
+    return 0
+
+
+def _clamp_columns(rows, columns):
+    """Picks `columns` from each row, clamping indexes past the table to its last column.
+    
+    The table width is that of its widest row (trailing empty cells ignored),
+    as pandas reads it. Rows are passed through as soon as a row reaching the
+    highest requested column has been seen; the rows before it are held back
+    until then (all of them when an index is past the table, since the width
+    is only known at the end). Missing cells are None.
+    """
+    rows = iter(rows)
+    if columns is None:
+        for row in rows:
+            yield tuple(row)
+        return
+
+    needed = max(columns) + 1
+    held = []
+    width = 0
+    for row in rows:
+        held.append(row)
+        width = max(width, _row_width(row))
+        if width >= needed:
+            break
+    else:
+        columns = [min(c, max(0, width - 1)) for c in columns]
+
+    for source in (held, rows):
+        for row in source:
+            yield tuple(row[c] if c < len(row) else None for c in columns)
+
+
+def open_workbook(excel_path):
+    """Opens an Excel workbook read-only, for reading several sheets with one parse.
+    
+    Pass the result as `workbook` to the readers below and close it when done.
+    """
+    return load_workbook(excel_path, read_only=True, data_only=True)
+
+
+def iter_excel_rows(excel_path, columns=None, sheet_name=None, workbook=None):
+    """Streams rows from an Excel sheet without loading the workbook into memory.
+    
+    The workbook is opened in openpyxl's read-only mode, so memory stays flat
+    regardless of sheet size. The sheet's stored dimension is ignored (it is
+    often stale) and every row is read to its last cell.
+    
+    Args:
+        excel_path: Path to Excel file
+        columns: Column indexes (0-based) to yield, or None for every column.
+                 Indexes past the last non-empty column are clamped to it.
+        sheet_name: Sheet to read (default: first sheet)
+        workbook: Workbook from open_workbook to read from instead of
+                  opening excel_path (left open)
+    
+    Yields:
+        Tuple of cell values per row, in the order of `columns`
+    """
+    owned = workbook is None
+    if owned:
+        workbook = open_workbook(excel_path)
+    try:
+        sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        sheet.reset_dimensions()
+        yield from _clamp_columns(sheet.iter_rows(min_row=1, values_only=True), columns)
+    finally:
+        if owned:
+            workbook.close()
+
+
+def iter_csv_rows(csv_path, columns=None):
+    """Streams rows from a CSV file (no header assumed, like the Excel reader).
+    
+    Column indexes past the widest row are clamped to its last column.
+    """
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        yield from _clamp_columns(csv.reader(f), columns)
+
+
+def _iter_json_records(records, columns):
+    """Yields rows from JSON rows that are either arrays or objects keyed by column name.
+    
+    Objects take the keys of the first object as their columns. When the
+    file starts with an object, column indexes are clamped to those keys;
+    otherwise they are clamped to the widest row, like CSV.
+    """
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return
+    keys = list(first.keys()) if isinstance(first, dict) else None
+
+    def rows():
+        nonlocal keys
+        for record in itertools.chain([first], records):
+            if isinstance(record, dict):
+                if keys is None:
+                    keys = list(record.keys())
+                yield [record.get(k) for k in keys]
+            elif isinstance(record, list):
+                yield record
+            else:
+                yield [record]
+
+    if keys is not None and columns is not None:
+        columns = [min(c, max(0, len(keys) - 1)) for c in columns]
+        for row in rows():
+            yield tuple(row[c] if c < len(row) else None for c in columns)
+    else:
+        yield from _clamp_columns(rows(), columns)
+
+
+def iter_json_rows(json_path, columns=None):
+    """Reads rows from a JSON array of arrays, objects or plain values.
+    
+    For objects the keys of the first object are the columns (and act as the
+    header, so no header row is yielded).
+    """
+    with open(json_path, 'r', encoding='utf-8-sig') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        # Allow {"models": [...]} / {"data": [...]} style wrappers
+        data = next((v for v in data.values() if isinstance(v, list)), [])
+    yield from _iter_json_records(data, columns)
+
+
+def iter_ndjson_rows(ndjson_path, columns=None):
+    """Streams rows from newline-delimited JSON, parsing one line at a time."""
+    def records():
+        with open(ndjson_path, 'r', encoding='utf-8-sig') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    yield from _iter_json_records(records(), columns)
+
+
+def iter_parquet_rows(parquet_path, columns=None):
+    """Streams rows from a Parquet file using memory-mapped columnar reads.
+    
+    Only the selected columns are read, one record batch at a time. Column
+    names are the header, so no header row is yielded.
+    """
+    try:
+        import pyarrow.parquet as pq  # pip install pyarrow
+    except ImportError:
+        raise ValueError("Reading Parquet model lists requires pyarrow (pip install pyarrow)")
+
+    parquet_file = pq.ParquetFile(parquet_path, memory_map=True)
+    names = parquet_file.schema_arrow.names
+    if columns is None:
+        selected = names
+    else:
+        selected = [names[min(c, max(0, len(names) - 1))] for c in columns]
+
+    for batch in parquet_file.iter_batches(columns=list(dict.fromkeys(selected))):
+        yield from zip(*(batch.column(name).to_pylist() for name in selected))
+
+
+def iter_table_rows(table_path, columns=None, sheet_name=None, workbook=None):
+    """Streams rows from any supported model list file, chosen by extension.
+    
+    Args:
+        table_path: Path to an .xlsx, .csv, .parquet, .json, .ndjson or .jsonl file
+        columns: Column indexes (0-based) to yield, or None for every column
+        sheet_name: Sheet to read for Excel files (default: first sheet)
+        workbook: Already open workbook of an Excel file (see open_workbook)
+    """
+    ext = os.path.splitext(str(table_path))[1].lower()
+    if ext == '.csv':
+        return iter_csv_rows(table_path, columns)
+    if ext == '.parquet':
+        return iter_parquet_rows(table_path, columns)
+    if ext == '.json':
+        return iter_json_rows(table_path, columns)
+    if ext in ('.ndjson', '.jsonl'):
+        return iter_ndjson_rows(table_path, columns)
+    return iter_excel_rows(table_path, columns, sheet_name, workbook)
+
+
+def read_model_names(table_path, column_index=0, sheet_name=None, workbook=None):
+    """Reads the cleaned list of model names from one column of a model list file.
+    
+    Only the selected column is streamed from the file; empty and 'nan'
+    values and a recognised header row are dropped as rows are read, and the
+    names are Unicode-normalized as load_naming_data normalizes its columns.
+    
+    Args:
+        table_path: Path to Excel, CSV, Parquet or JSON/NDJSON file
+        column_index: Which column to read model names from (0-based, clamped to the table)
+        sheet_name: Sheet to read for Excel files (default: first sheet)
+        workbook: Already open workbook of an Excel file (see open_workbook)
+    """
+    rows = iter_table_rows(table_path, columns=[column_index], sheet_name=sheet_name, workbook=workbook)
+    try:
+        return clean_model_names(_cell_to_str(row[0]) for row in rows)
+    except Exception:
+        if not str(table_path).lower().endswith('.xlsx'):
+            raise
+        # Fallback to using load_naming_data if the streaming Excel read fails
+        naming_data = load_naming_data(table_path)
+        if naming_data is None:
+            raise ValueError("Error loading naming data from Excel file")
+        return clean_model_names(naming_data.iloc[:, 0].astype(str).tolist())
+
+
+def _column_key(name):
+    """Normalise a header cell into a variable-friendly column name."""
+    return str(name).strip().lower().replace(' ', '_')
+
+
+def read_table_column_names(table_path):
+    """Returns the column names of formats that carry them (Parquet, JSON objects), else None."""
+    ext = os.path.splitext(str(table_path))[1].lower()
+    if ext == '.parquet':
+        import pyarrow.parquet as pq  # pip install pyarrow
+        return list(pq.read_schema(table_path).names)
+    if ext in ('.json', '.ndjson', '.jsonl'):
+        with open(table_path, 'r', encoding='utf-8-sig') as f:
+            if ext == '.json':
+                data = json.load(f)
+                if isinstance(data, dict):
+                    data = next((v for v in data.values() if isinstance(v, list)), [])
+                first = data[0] if data else None
+            else:
+                first = next((json.loads(line) for line in f if line.strip()), None)
+        if isinstance(first, dict):
+            return list(first.keys())
+    return None
+
+
+def read_model_table(table_path, column_index=0, sheet_name=None, workbook=None):
+    """Reads model names together with every other column of their rows.
+    
+    Rows are kept or dropped with the same rules as read_model_names. Each
+    column is exposed as `col_<index>` and, when the file has a header (a
+    recognised header in the model column, or named Parquet/JSON columns),
+    also under its lowercased, underscore-separated header name.
+    
+    Args:
+        table_path: Path to Excel, CSV, Parquet or JSON/NDJSON file
+        column_index: Which column holds the model names (0-based, clamped to the table)
+        sheet_name: Sheet to read for Excel files (default: first sheet)
+        workbook: Already open workbook of an Excel file (see open_workbook)
+    
+    Returns:
+        Tuple of (model names, dict of column name to values aligned with the model names)
+    """
+    names = read_table_column_names(table_path)
+    # Every column is kept in memory anyway, so read the rows first to find the widest one
+    rows = list(iter_table_rows(table_path, sheet_name=sheet_name, workbook=workbook))
+    width = len(names) if names else max((_row_width(row) for row in rows), default=0)
+    model_col = min(column_index, max(0, width - 1))
+    columns = {f'col_{c}': [] for c in range(width)}
+    model_names = []
+    header = None
+    for i, row in enumerate(rows):
+        values = [_cell_to_str(row[c]) if c < len(row) else '' for c in range(width)]
+        m_clean = values[model_col].strip() if width else ''
+        # Skip if empty or 'nan'
+        if not m_clean or m_clean.lower() == 'nan':
+            continue
+        # First row is a header only if the model column holds a common header name
+        if i == 0 and m_clean.lower() in COMMON_MODEL_HEADERS:
+            header = values
+            continue
+        model_names.append(m_clean)
+        for c in range(width):
+            columns[f'col_{c}'].append(values[c].strip())
+    # Normalize the names (as read_model_names does) and each column as a whole once every row is in
+    model_names = normalize_texts(model_names)
+    for c in range(width):
+        columns[f'col_{c}'] = normalize_texts(columns[f'col_{c}'])
+
+    header = names or header
+    if header:
+        for c, name in enumerate(header[:width]):
+            key = _column_key(name)
+            if key and key not in columns:
+                columns[key] = columns[f'col_{c}']
+    return model_names, columns
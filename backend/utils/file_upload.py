@@ -0,0 +1,121 @@
+"""
+Upload helpers - stream incoming files to disk in fixed-size chunks
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import aiofiles
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# Size of each read from the incoming upload (bytes)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the allowed number of bytes"""
+
+    def __init__(self, filename: str, limit: int):
+        super().__init__(f"Upload {filename} exceeds the size limit of {limit} bytes")
+        self.filename = filename
+        self.limit = limit
+
+
+async def save_upload_file(
+    upload,
+    destination: Union[str, Path],
+    max_bytes: Optional[int] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> Tuple[int, str]:
+    """
+    Stream an uploaded file to disk without holding it in memory
+
+    The file is read in fixed-size chunks, written with async file I/O and
+    hashed on the fly. A partially written file is removed if the size limit
+    is exceeded or the write fails.
+
+    Args:
+        upload: FastAPI UploadFile (anything with an async read(size) method)
+        destination: Path to write the file to
+        max_bytes: Maximum number of bytes allowed for this file (None for no limit)
+        chunk_size: Number of bytes read per chunk
+
+    Returns:
+        Tuple of (bytes written, SHA-256 hex digest)
+    """
+    destination = Path(destination)
+    digest = hashlib.sha256()
+    written = 0
+
+    try:
+        async with aiofiles.open(destination, 'wb') as out_file:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    raise UploadTooLargeError(upload.filename or destination.name, max_bytes)
+                digest.update(chunk)
+                await out_file.write(chunk)
+    except BaseException:
+        try:
+            destination.unlink()
+        except OSError:
+            pass
+        raise
+
+    return written, digest.hexdigest()
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware that refuses request bodies larger than max_bytes with 413
+
+    Starlette spools a multipart upload to a temporary file before the
+    endpoint runs, so the per-file limit of save_upload_file only applies
+    once the whole body has been read. A Content-Length over the limit is
+    refused before any of the body is read; a body without one (chunked)
+    is cut off as soon as it passes the limit.
+    """
+
+    def __init__(self, app, max_bytes: Optional[int]):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def _detail(self) -> str:
+        return f"Request body exceeds the size limit of {self.max_bytes} bytes"
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope['headers']:
+            if name == b'content-length':
+                try:
+                    declared = int(value)
+                except ValueError:
+                    break
+                if declared > self.max_bytes:
+                    response = JSONResponse({'detail': self._detail()}, status_code=413)
+                    await response(scope, receive, send)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    # Re-raised as is by FastAPI's body parsing, so the client gets the 413
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
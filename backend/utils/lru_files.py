@@ -0,0 +1,47 @@
+"""
+LRU files - keeps a folder of cached files under a size limit
+
+A file's modification time records when it was last used (touch it on every
+use); eviction deletes the least recently used files first.
+"""
+
+import os
+from pathlib import Path
+from typing import Iterable, List, Tuple, Union
+
+
+def touch(path: Union[str, Path]) -> None:
+    """Mark a file as just used (missing files are ignored)"""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def evict_least_recent(
+    candidates: Iterable[Tuple[float, int, str]],
+    total: int,
+    max_bytes: int,
+) -> List[str]:
+    """
+    Delete the least recently used files until total is within max_bytes
+
+    Args:
+        candidates: (mtime, size, path) of every file that may be deleted
+        total: Bytes used by all files, including those that may not be deleted
+        max_bytes: Size limit
+
+    Returns:
+        Paths of the deleted files
+    """
+    evicted = []
+    for _, size, path in sorted(candidates):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        total -= size
+        evicted.append(path)
+    return evicted
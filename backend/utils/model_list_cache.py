@@ -0,0 +1,141 @@
+"""
+Model list cache - keeps cleaned model name lists keyed by workbook content
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple, Union
+
+import openpyxl
+
+from utils.lru_files import evict_least_recent, touch
+
+# Bump when the parsing or cleaning rules change so stale entries are ignored
+CACHE_FORMAT_VERSION = 5
+# Part of every cache key: entries parsed by another reader version are ignored
+READER_VERSION = f"{CACHE_FORMAT_VERSION}/openpyxl-{openpyxl.__version__}"
+
+# Relative paths are resolved against the backend folder, not the working directory
+_BACKEND_DIR = Path(__file__).resolve().parent.parent
+MODEL_LIST_CACHE_DIR = _BACKEND_DIR / os.getenv("MODEL_LIST_CACHE_DIR", "cache/model_lists")
+# Size limit of the on-disk cache; least recently used entries are evicted (0 for no limit)
+MODEL_LIST_CACHE_MAX_BYTES = int(os.getenv("MODEL_LIST_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+
+def file_sha256(file_path: Union[str, Path], chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelListCache:
+    """
+    Cache of parsed model lists keyed by (reader version, content hash, sheet, column)
+
+    Entries (model name lists, or model tables with their row columns) are
+    pickled on disk, with a small in-memory LRU
+    in front so repeat runs in the same process skip the disk read as well.
+    With max_bytes, storing an entry evicts the least recently used files
+    (by the time they were last stored or read) until the cache fits.
+    """
+
+    def __init__(self, root: Union[str, Path], memory_entries: int = 32, max_bytes: Optional[int] = None):
+        self.root = Path(root)
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes or None
+        self._memory: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key: Tuple) -> Path:
+        reader_version, content_hash, sheet, column = key
+        name = hashlib.sha256(repr((reader_version, sheet, column)).encode('utf-8')).hexdigest()[:16]
+        return self.root / content_hash[:2] / f"{content_hash}_{name}.pkl"
+
+    def _remember(self, key: Tuple, value: Any) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, content_hash: str, sheet=0, column=0) -> Optional[Any]:
+        """
+        Look up a cached model list
+
+        Returns:
+            The cached value (lists are copied, other values must be treated
+            as read-only), or None on a cache miss
+        """
+        key = (READER_VERSION, content_hash, sheet, column)
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._memory.move_to_end(key)
+                return list(cached) if isinstance(cached, list) else cached
+
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+        touch(entry_path)
+        self._remember(key, value)
+        return list(value) if isinstance(value, list) else value
+
+    def put(self, content_hash: str, sheet, column, value: Any) -> None:
+        """Store a cleaned model list or model table (write failures are ignored)"""
+        key = (READER_VERSION, content_hash, sheet, column)
+        if isinstance(value, list):
+            value = list(value)
+        self._remember(key, value)
+
+        entry_path = self._entry_path(key)
+        tmp_path = entry_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            return
+        self.evict(protect=entry_path)
+
+    def evict(self, protect: Optional[Path] = None) -> None:
+        """Delete least recently used entry files until the cache is within max_bytes"""
+        if not self.max_bytes:
+            return
+        candidates = []
+        total = 0
+        try:
+            folders = [folder for folder in self.root.iterdir() if folder.is_dir()]
+        except OSError:
+            return
+        for folder in folders:
+            for entry in os.scandir(folder):
+                if not entry.is_file() or not entry.name.endswith('.pkl'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                total += stat.st_size
+                if protect is None or entry.path != str(protect):
+                    candidates.append((stat.st_mtime, stat.st_size, entry.path))
+        evict_least_recent(candidates, total, self.max_bytes)
+
+
+model_list_cache = ModelListCache(MODEL_LIST_CACHE_DIR, max_bytes=MODEL_LIST_CACHE_MAX_BYTES)
@@ -0,0 +1,75 @@
+"""
+Unicode normalization for model names and file paths
+
+Values are NFKC-normalized and en-dashes replaced with hyphens. ASCII values
+are returned untouched, and normalized results are memoized for the life of
+the process so repeated names are only normalized once.
+"""
+
+import unicodedata
+from functools import lru_cache
+from typing import Any, Iterable, List
+
+
+@lru_cache(maxsize=65536)
+def _normalize_non_ascii(text: str) -> str:
+    """Normalize a string that contains non-ASCII characters"""
+    normalized = unicodedata.normalize('NFKC', text)
+    # Replace en-dash with regular hyphen to prevent encoding issues
+    return normalized.replace('–', '-')
+
+
+def normalize_text(value: Any) -> Any:
+    """
+    Normalize a single value (non-strings are returned unchanged)
+
+    Args:
+        value: Value to normalize
+
+    Returns:
+        Normalized string, or the original value if it is not a string
+    """
+    if isinstance(value, str) and not value.isascii():
+        return _normalize_non_ascii(value)
+    return value
+
+
+def normalize_texts(values: Iterable[Any]) -> List[Any]:
+    """
+    Normalize a batch of values
+
+    Args:
+        values: Iterable of values (non-strings are passed through)
+
+    Returns:
+        List of normalized values in the same order
+    """
+    return [normalize_text(value) for value in values]
+
+
+def normalize_text_column(series):
+    """
+    Normalize a whole pandas column
+
+    Only the distinct non-ASCII strings in the column are normalized; the
+    results are then applied to the column in one vectorized mapping. The
+    original series is returned when nothing changes.
+
+    Args:
+        series: pandas Series
+
+    Returns:
+        Series with normalized string values
+    """
+    replacements = {}
+    for value in set(series.dropna().tolist()):
+        if isinstance(value, str) and not value.isascii():
+            normalized = _normalize_non_ascii(value)
+            if normalized != value:
+                replacements[value] = normalized
+
+    if not replacements:
+        return series
+
+    changed = series.isin(list(replacements))
+    return series.where(~changed, series.map(replacements))
@@ -0,0 +1,133 @@
+"""
+Streaming ZIP - build a ZIP archive on the fly without a temporary file, and
+read single entries back out of a finished archive
+"""
+
+import io
+import struct
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+# Local file header: signature + fixed fields, then file name and extra field
+_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+# (local header offset, compressed size, uncompressed size, compression type)
+ZipEntry = Tuple[int, int, int, int]
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink whose contents are drained as the archive grows"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip_stream(
+    entries: Iterable[Tuple[Union[str, Path], str]],
+    compression: int = zipfile.ZIP_DEFLATED,
+) -> Iterator[bytes]:
+    """
+    Stream a ZIP archive of files, one chunk per entry
+
+    The archive is written to a non-seekable buffer, so zipfile uses data
+    descriptors and nothing is held beyond the current entry.
+
+    Args:
+        entries: Iterable of (file path, archive name); missing files are skipped
+        compression: zipfile compression constant
+
+    Yields:
+        Bytes of the archive
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression) as zipf:
+        for file_path, archive_name in entries:
+            try:
+                zipf.write(file_path, archive_name)
+            except FileNotFoundError:
+                continue
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+    chunk = buffer.drain()
+    if chunk:
+        yield chunk
+
+
+def zip_entry_index(zipf: zipfile.ZipFile) -> Dict[str, ZipEntry]:
+    """
+    Build an index of a ZIP's entries while it is still open for writing
+
+    The index lets single entries be read later without parsing the
+    archive's central directory.
+
+    Returns:
+        Dict of archive name to ZipEntry
+    """
+    return {
+        info.filename: (info.header_offset, info.compress_size, info.file_size, info.compress_type)
+        for info in zipf.infolist()
+    }
+
+
+def iter_zip_entry(
+    zip_path: Union[str, Path],
+    archive_name: str,
+    entry: ZipEntry,
+    chunk_size: int = 1024 * 1024,
+) -> Iterator[bytes]:
+    """
+    Stream one entry of a ZIP archive using its index entry
+
+    Stored and deflated entries are read directly from their local header
+    offset; other compression types fall back to zipfile.
+
+    Args:
+        zip_path: Path to the archive
+        archive_name: Name of the entry in the archive
+        entry: The entry's ZipEntry from zip_entry_index
+        chunk_size: Number of compressed bytes read at a time
+
+    Yields:
+        Uncompressed bytes of the entry
+    """
+    header_offset, compress_size, _, compress_type = entry
+    if compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        with zipfile.ZipFile(zip_path) as zipf, zipf.open(archive_name) as member:
+            for chunk in iter(lambda: member.read(chunk_size), b''):
+                yield chunk
+        return
+
+    with open(zip_path, 'rb') as f:
+        f.seek(header_offset)
+        header = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+        if header[0] != _LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"Bad local file header for {archive_name}")
+        f.seek(header[-2] + header[-1], io.SEEK_CUR)
+
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if compress_type == zipfile.ZIP_DEFLATED else None
+        remaining = compress_size
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated entry {archive_name}")
+            remaining -= len(chunk)
+            yield decompressor.decompress(chunk) if decompressor else chunk
+        if decompressor:
+            yield decompressor.flush()